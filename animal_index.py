@@ -0,0 +1,37 @@
+import numpy as np
+
+from preprocessing import memoize
+
+
+class AnimalIndex:
+    """raw_data sorted by animal then air date, with each animal's contiguous row range.
+
+    Looking up an animal is a dictionary access and returns a positional slice of the
+    sorted frame rather than a filtered copy of raw_data.
+    """
+
+    def __init__(self, raw_data):
+        # Rows without an animal name belong to no page, and would sort after the last animal
+        animal = raw_data["Animal"].astype("category")
+        named = animal.notna()
+        self.sorted_data = raw_data[named].assign(Animal=animal[named]).sort_values(by=["Animal", "Air date"], kind="stable")
+
+        codes = self.sorted_data["Animal"].cat.codes.to_numpy()
+        categories = self.sorted_data["Animal"].cat.categories
+        bounds = np.searchsorted(codes, np.arange(len(categories) + 1))
+
+        self.ranges = {
+            animal: (bounds[i], bounds[i + 1])
+            for i, animal in enumerate(categories)
+            if bounds[i] < bounds[i + 1]
+        }
+        self.animals = sorted(self.ranges)
+
+    def rows(self, animal):
+        # Appearances of one animal in air date order, empty if the animal is unknown
+        start, stop = self.ranges.get(animal, (0, 0))
+        return self.sorted_data.iloc[start:stop]
+
+
+def animal_index(raw_data):
+    return memoize("animal_index", raw_data, AnimalIndex)
@@ -0,0 +1,116 @@
+from datetime import datetime as dt
+
+import altair as alt
+import pandas as pd
+
+from chart_data import location_points, timeline_points
+from formatting import date_labels, italic_names, show_year_labels, status_badges
+from maps import countries_map
+
+# Rendering for the "Search by animal" page, shared by main.py and the static export
+# in scripts/export_animal_pages.py
+
+status_css = {
+    'LC': 'background-color: #4fc1ff; border: 2px solid #3a95d1; color: #ffffff; text-shadow: 0px 0px 1px #3283b5;',
+    'NT': 'background-color: #67d62f; border: 2px solid #4cb517; color: #ffffff; text-shadow: 0px 0px 1px #47a315;',
+    'VU': 'background-color: #d6ba18; border: 2px solid #cfa715; color: #ffffff; text-shadow: 0px 0px 1px #c28b00;',
+    'EN': 'background-color: #ff9123; border: 2px solid #c48e21; color: #ffffff; text-shadow: 0px 0px 1px #b38220;',
+    'CR': 'background-color: #f03022; border: 2px solid #a8482b; color: #ffffff; text-shadow: 0px 0px 1px #7d3a25;',
+    'EW': 'background-color: #542344; border: 2px solid #3d1931; color: #ffffff; text-shadow: 0px 0px 2px #000000;',
+    'NE': 'background-color: #ffffff; border: 2px solid #ebebeb; color: #000000; text-shadow: 0px 0px 2px #ffffff;',
+    'DD': 'background-color: #ffffff; border: 2px solid #ebebeb; color: #000000; text-shadow: 0px 0px 2px #ffffff;',
+    'DO': 'background-color: #9C826C; border: 2px solid #85552c; color: #ffffff; text-shadow: 0px 0px 2px #444444;',
+    'EX': 'background-color: #363636; border: 2px solid #ff4647; color: #ffffff; text-shadow: 0px 0px 2px #000000;',
+}
+
+no_images_html = "<div style='text-align:center;'><h6 style='color: darkgrey;'><i>Images not yet available. Check back soon.</i></h6></div>"
+
+
+def header_html(animal, animal_data):
+    # Animal name, last update, binomial name and status badge
+    binomial_name = animal_data["Binomial name"].iloc[0]
+    species_status = animal_data["Species status"].iloc[0]
+    species_status_code = animal_data["Species status code"].iloc[0]
+    last_updated_at = animal_data["Species lock date"].max()  # Get last Species lock date
+
+    header = f'<div class="animal-header"><h1 style="padding:0px;">{animal}</h1><span style="text-align:right;"><h6 style="opacity:0.5; padding:0px"><i>Updated: {last_updated_at.strftime("%-d %b %Y")}</i></h6></span></div>'
+    info = f'<div class="animal-info-header"><h5 style="padding:0px;"><i>{binomial_name}</i></h5> <span style="{status_css.get(species_status_code, "")}" class="ConservationStatusLabelLarge">{species_status}</span></div>' if pd.notna(species_status) else ""
+    return header, info
+
+
+def locations_chart(animal_data, base_map=countries_map):
+    points_df = location_points(animal_data)
+    if points_df.empty:
+        return base_map
+
+    points = alt.Chart(points_df).mark_circle(opacity=0.5, color='#EDCB0D').encode(
+        longitude='Lon:Q',
+        latitude='Lat:Q',
+        size=alt.value(50),
+        tooltip=[alt.Tooltip('Country:N'), alt.Tooltip('Show:N')]
+    ).interactive()
+    return base_map + points
+
+
+def timeline_chart(animal_data):
+    # Both layers draw from the same per-year points, which are sent once
+    chart_data = timeline_points(animal_data)
+    first_year = animal_data["Air date"].min().year
+
+    animal_dot_plot_chart = alt.Chart().mark_line(strokeDash=[4, 1], color="#353535").encode(
+        x=alt.X("year(Date):T", title="", scale=alt.Scale(domain=[first_year, dt.now().year])),
+        y=alt.Y("Animal:N", title="", axis=alt.Axis(labels=False)),
+        detail="Animal:N",
+    ).properties(height=80)
+
+    dots = alt.Chart().mark_circle(size=200, opacity=1).encode(
+        x=alt.X("year(Date):T", title="", scale=alt.Scale(domain=[first_year, dt.now().year])),
+        y=alt.Y("Animal:N", title="", axis=alt.Axis(labels=False)),
+        tooltip=[alt.Tooltip('Show:N')],
+        color=alt.Color('year(Date):N', scale=alt.Scale(scheme="goldred"), sort="descending", legend=None),
+    )
+    return alt.layer(animal_dot_plot_chart, dots, data=chart_data)
+
+
+def timeline_headers(animal_data):
+    # Timeline table columns; subspecies details only when the animal has several subspecies
+    table_headers = ["Date",
+                     "Show",
+                     "Episode",
+                     "Watch now",
+                     "Country",
+                     "Continent"]
+
+    if len(animal_data["Animal subspecies"].unique()) > 1:
+        table_headers.extend(["Name", "Scientific name", "IUCN status"])
+    return table_headers
+
+
+def timeline_table(animal_data, episodes, sort_by="Date"):
+    table_headers = timeline_headers(animal_data)
+    table_data = animal_data.copy()
+
+    if "Name" in table_headers:
+        table_data.rename(columns={'Animal subspecies': 'Name'}, inplace=True)
+        table_data["Scientific name"] = italic_names(table_data["Scientific name"])
+        table_data["IUCN status"] = status_badges(table_data["Subspecies status code"], status_css)
+
+    table_data["Date"] = date_labels(table_data["Air date"])
+
+    table_data["Country"] = table_data["Country"].astype(object).fillna("")
+    table_data["Continent"] = table_data["Continent"].astype(object).fillna("")
+
+    table_data = table_data.join(episodes[["Watch now"]], on=["Show", "Episode"])
+    table_data["Watch now"] = table_data["Watch now"].fillna("")
+
+    # Status codes are an ordered category, so they sort from least to most threatened
+    if sort_by == "IUCN status":
+        table_data.sort_values(by="Subspecies status code", kind="stable", inplace=True)
+    elif sort_by == "Date":
+        table_data.sort_values(by="Air date", inplace=True)
+    else:
+        table_data.sort_values(by=sort_by, inplace=True)
+
+    table_data["Show"] = show_year_labels(table_data["Show"], table_data["Air date"])
+
+    return table_data[table_headers].drop_duplicates()
@@ -0,0 +1,184 @@
+# Times each stage of the app's pipeline on synthetic datasets of several sizes, from reading the
+# sheet to building chart specs, without Streamlit or Google credentials. Derived data is built
+# directly rather than through memoize so every run measures the real work.
+#
+#   python benchmarks/bench.py --sizes 20000 200000 2000000 --save baseline.json
+#   python benchmarks/bench.py --sizes 20000 200000 2000000 --compare baseline.json
+#
+# With --compare, stages slower than the baseline by more than --tolerance (and by at least a
+# millisecond, so timer noise on tiny stages is ignored) are reported as regressions and the exit
+# status is 1.
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import altair as alt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from animal_index import AnimalIndex  # noqa: E402
+from animal_page import locations_chart, timeline_chart  # noqa: E402
+from chart_data import appearance_points  # noqa: E402
+from cube import SpeciesCube  # noqa: E402
+from facets import FacetIndex  # noqa: E402
+from formatting import date_labels, show_year_labels, status_badges  # noqa: E402
+from gallery import build_image_manifest, gallery_html, sample_gallery  # noqa: E402
+from preprocessing import build_raw_data, data_version, forget_data_version  # noqa: E402
+from sources import SqliteSource  # noqa: E402
+from summaries import build_species_summary  # noqa: E402
+from synthetic import generate_appearances, generate_episodes, write_tables  # noqa: E402
+from tables import table_html  # noqa: E402
+
+sample_animal = "African bush elephant"
+
+# Slowdowns smaller than this are timer noise rather than regressions
+min_regression_seconds = 0.001
+
+# Streamlit sends chart data of any size, so measure it the same way
+alt.data_transformers.disable_max_rows()
+
+# Sidebar selections exercised by the filter stage: none, one continent, and a narrow combination
+sample_selections = [
+    {},
+    {"Continent": ["Africa"]},
+    {"Continent": ["Asia", "Europe"], "Class": ["Aves"], "Family": []},
+]
+
+
+def timed(run, repeat):
+    # Best of `repeat` runs, and the last result so later stages can use it
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def payload_bytes(result):
+    # Size of the rendered HTML or chart JSON sent to the browser
+    if isinstance(result, str):
+        return len(result.encode())
+    return sum(len(item.encode()) for item in result)
+
+
+def chart_specs(raw_data, summary, animal_data):
+    # The animal page's timeline and locations charts and the location tab's species-over-time
+    # dot plot, serialized as the Vega-Lite JSON that is sent to the browser
+    most_recent = summary.sort_values(by="Last Appeared Date", ascending=False).index[:20]
+    dot_plot_df = appearance_points(
+        raw_data[raw_data["Binomial name"].isin(most_recent)].join(summary["Last Appeared Date"], on="Binomial name"),
+        ["Last Appeared Date"]
+    )
+    dot_plot = alt.Chart(dot_plot_df).mark_line(point=True).encode(
+        x=alt.X("Air date:T", title=""),
+        y=alt.Y("Animal:N", title=""),
+        detail="Animal:N",
+        tooltip=[alt.Tooltip("Animal:N"), alt.Tooltip("Show:N")],
+        color=alt.Color("Last Appeared Date:N", legend=None),
+    )
+    return [timeline_chart(animal_data).to_json(), locations_chart(animal_data).to_json(), dot_plot.to_json()]
+
+
+def run_size(n_rows, repeat, work_dir):
+    df = generate_appearances(n_rows)
+    write_tables({"appearances": df, "episodes": generate_episodes(df)}, work_dir, "sqlite")
+
+    stages = {}
+
+    def stage(name, run, rows, payload=False):
+        seconds, result = timed(run, repeat)
+        stages[name] = {"seconds": seconds, "rows": rows, "bytes": payload_bytes(result) if payload else None}
+        return result
+
+    source = SqliteSource(work_dir / "wildlife.sqlite", "appearances")
+    df = stage("ingest", source.fetch, n_rows)
+
+    def version():
+        forget_data_version(df)
+        return data_version(df)
+
+    stage("data version", version, len(df))
+    raw_data = stage("preprocess", lambda: build_raw_data(df), len(df))
+    n = len(raw_data)
+
+    facets = stage("facet index", lambda: FacetIndex(raw_data), n)
+    stage("filter masks", lambda: [facets.mask(selections) for selections in sample_selections], n)
+
+    animals = stage("animal index", lambda: AnimalIndex(raw_data), n)
+    animal_data = stage("animal selection", lambda: animals.rows(sample_animal), n)
+
+    manifest = stage("image manifest", lambda: build_image_manifest(raw_data), n)
+    stage("gallery html", lambda: gallery_html(sample_gallery(manifest.loc[[sample_animal]], sample_animal, "bench")),
+          len(animal_data), payload=True)
+
+    def timeline_table():
+        table = animal_data.assign(Date=date_labels(animal_data["Air date"]),
+                                   Show=show_year_labels(animal_data["Show"], animal_data["Air date"]))
+        return table_html(table[["Date", "Show", "Episode", "Country", "Continent"]])
+
+    def species_table():
+        species = raw_data[["Animal", "Binomial name", "Species status code"]].drop_duplicates().sort_values(by="Animal")
+        return table_html(species.head(50).assign(**{"IUCN status": status_badges(species.head(50)["Species status code"], {})}))
+
+    stage("timeline table html", timeline_table, len(animal_data), payload=True)
+    stage("species table html", species_table, n, payload=True)
+
+    cube = stage("species cube", lambda: SpeciesCube(raw_data), n)
+    stage("species counts", lambda: [cube.species_counts(selections, ["Country", "ISO3166 ID"]) for selections in sample_selections], n)
+
+    summary = stage("species summary", lambda: build_species_summary(raw_data), n)
+    stage("chart specs", lambda: chart_specs(raw_data, summary, animal_data), n, payload=True)
+
+    return stages
+
+
+def report(results, baseline=None, tolerance=1.2):
+    regressions = []
+    print(f"{'rows':>10}  {'stage':<22}{'seconds':>10}{'rows/s':>14}{'payload':>12}{'vs baseline':>13}")
+    for size, stages in results.items():
+        for name, result in stages.items():
+            rate = f"{result['rows'] / result['seconds']:,.0f}" if result["seconds"] > 0 else ""
+            payload = f"{result['bytes']:,}" if result["bytes"] is not None else ""
+            change = ""
+            previous = (baseline or {}).get(size, {}).get(name)
+            if previous and previous["seconds"] > 0:
+                ratio = result["seconds"] / previous["seconds"]
+                change = f"{ratio:.2f}x"
+                if ratio > tolerance and result["seconds"] - previous["seconds"] > min_regression_seconds:
+                    regressions.append((size, name, ratio))
+            print(f"{int(size):>10,}  {name:<22}{result['seconds']:>10.4f}{rate:>14}{payload:>12}{change:>13}")
+
+    for size, name, ratio in regressions:
+        print(f"REGRESSION: {name} at {int(size):,} rows is {ratio:.2f}x slower than the baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the pipeline on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 200_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=Path, help="write the results as JSON, e.g. to use as a baseline")
+    parser.add_argument("--compare", type=Path, help="baseline JSON from an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_rows in args.sizes:
+            results[str(n_rows)] = run_size(n_rows, args.repeat, Path(work_dir))
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
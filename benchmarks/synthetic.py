@@ -0,0 +1,174 @@
+# Generates synthetic appearance and episode sheets with the same columns as the real ones, for
+# benchmarks and for running the app without Google credentials. Species popularity is Zipf
+# skewed like the real data, species range over several countries, some rows list more than one
+# country, and most appearances have gallery images.
+#
+#   python benchmarks/synthetic.py --rows 200000 --format parquet --out data
+#   WOS_DATA_SOURCE=parquet WOS_DATA_DIR=data streamlit run main.py
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from preprocessing import initial_cols, status_order  # noqa: E402
+
+# (country as written in the sheet, alpha-3 code, continent), including the sheet's own spellings
+countries = [
+    ("Kenya", "KEN", "Africa"), ("Tanzania", "TZA", "Africa"), ("South Africa", "ZAF", "Africa"),
+    ("Madagascar", "MDG", "Africa"), ("Botswana", "BWA", "Africa"), ("Namibia", "NAM", "Africa"),
+    ("India", "IND", "Asia"), ("Indonesia", "IDN", "Asia"), ("China", "CHN", "Asia"),
+    ("Viet Nam", "VNM", "Asia"), ("Japan", "JPN", "Asia"), ("Türkiye", "TUR", "Asia"),
+    ("United Kingdom", "GBR", "Europe"), ("Norway", "NOR", "Europe"), ("Spain", "ESP", "Europe"),
+    ("Russia", "RUS", "Europe"), ("USA", "USA", "North America"), ("Canada", "CAN", "North America"),
+    ("Mexico", "MEX", "North America"), ("Costa Rica", "CRI", "North America"),
+    ("Brazil", "BRA", "South America"), ("Peru", "PER", "South America"), ("Argentina", "ARG", "South America"),
+    ("Ecuador", "ECU", "South America"), ("Australia", "AUS", "Oceania"), ("New Zealand", "NZL", "Oceania"),
+    ("Papua New Guinea", "PNG", "Oceania"), ("Antarctica", "ATA", "Antarctica"),
+]
+
+classes = ["Mammalia", "Aves", "Reptilia", "Amphibia", "Actinopterygii", "Insecta", "Chondrichthyes", "Cephalopoda"]
+shows = ["Planet Earth", "Planet Earth II", "Planet Earth III", "Blue Planet", "Blue Planet II", "Frozen Planet",
+         "Frozen Planet II", "Dynasties", "Seven Worlds, One Planet", "Our Planet", "The Green Planet",
+         "Life", "Africa", "Life in Colour", "A Perfect Planet", "Wild Isles"]
+# Rough shares of each status code among assessed species, in status_order
+status_weights = [0.545, 0.1, 0.1, 0.08, 0.05, 0.005, 0.01, 0.03, 0.03, 0.05]
+
+
+def generate_appearances(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    # The catalogue of species grows sublinearly with the number of appearances
+    n_species = max(50, int(40 * n_rows ** 0.5))
+    n_episodes = max(20, n_rows // 40)
+
+    species = pd.DataFrame({
+        "Animal_name_original": [f"Synthetic animal {i}" for i in range(n_species)],
+        "Scientific_name": [f"Genus{i // 7} species{i}" for i in range(n_species)],
+        "Species_status_original": rng.choice(status_order, n_species, p=status_weights),
+        "Class": rng.choice(classes, n_species, p=[0.35, 0.3, 0.1, 0.05, 0.1, 0.05, 0.03, 0.02]),
+        "Family": [f"Familidae{i // 23}" for i in range(n_species)],
+        "Animal_group": [f"Group {i // 61}" for i in range(n_species)],
+        "home": rng.integers(0, len(countries), n_species),
+    })
+    # The app opens on the sample animal, so the most popular species is always it
+    species.loc[0, ["Animal_name_original", "Scientific_name"]] = ["African bush elephant", "Loxodonta africana"]
+    # Every few species is indeterminate and gets dropped by pre-processing, like "Eagle sp."
+    indeterminate = np.arange(n_species) % 97 == 96
+    species.loc[indeterminate, "Animal_name_original"] = [f"Synthetic genus {i} sp." for i in np.flatnonzero(indeterminate)]
+
+    episodes = pd.DataFrame({
+        "Show": rng.choice(shows, n_episodes),
+        "Episode": [f"Episode {i}" for i in range(n_episodes)],
+        "Air_date": pd.to_datetime("1990-01-01") + pd.to_timedelta(rng.integers(0, 12_500, n_episodes), unit="D"),
+    })
+
+    # Zipf-like popularity: a few charismatic species appear far more often than the rest
+    popularity = 1.0 / np.arange(1, n_species + 1) ** 1.1
+    species_rows = rng.choice(n_species, n_rows, p=popularity / popularity.sum())
+    episode_rows = rng.integers(0, n_episodes, n_rows)
+
+    df = pd.concat([
+        species.iloc[species_rows].reset_index(drop=True),
+        episodes.iloc[episode_rows].reset_index(drop=True),
+    ], axis=1)
+
+    # Species are mostly filmed near home, otherwise anywhere
+    country_rows = np.where(rng.random(n_rows) < 0.7, df.pop("home").to_numpy(), rng.integers(0, len(countries), n_rows))
+    names, codes, continents = (np.array(values, dtype=object) for values in zip(*countries))
+    df["Country"] = names[country_rows]
+    df["Country_code"] = codes[country_rows]
+    df["Continent"] = continents[country_rows]
+
+    # A few sequences were filmed across two countries and list both
+    two_countries = rng.random(n_rows) < 0.02
+    second = rng.integers(0, len(countries), n_rows)
+    df.loc[two_countries, "Country"] = df.loc[two_countries, "Country"] + ", " + names[second[two_countries]]
+    df.loc[two_countries, "Country_code"] = df.loc[two_countries, "Country_code"] + ", " + codes[second[two_countries]]
+    no_country = rng.random(n_rows) < 0.05
+    df.loc[no_country, ["Country", "Country_code", "Continent"]] = None
+
+    df["ID"] = np.arange(1, n_rows + 1)
+    df["Appearance_number"] = df.groupby("Scientific_name").cumcount() + 1
+    df["Coappearance_number"] = rng.integers(0, 4, n_rows)
+    df["Other_animals"] = None
+    df["Is_New"] = rng.random(n_rows) < 0.1
+    df["Sequence_number"] = rng.integers(1, 30, n_rows)
+
+    # Some appearances are of a named subspecies with its own status
+    subspecies = rng.random(n_rows) < 0.1
+    df["Animal_name"] = df["Animal_name_original"].where(~subspecies, df["Animal_name_original"] + " (subspecies)")
+    df["Scientific_name"] = df["Scientific_name"].where(~subspecies, df["Scientific_name"] + " minor")
+    df["Species_status"] = df["Species_status_original"].where(~subspecies, rng.choice(status_order, n_rows, p=status_weights))
+
+    df["Species_lock_date"] = df["Air_date"] + pd.to_timedelta(rng.integers(30, 3_000, n_rows), unit="D")
+    df["Location"] = "Location " + pd.Series(rng.integers(0, 500, n_rows)).astype(str)
+    df["Scientific_advisor"] = None
+    df["Lat"] = np.where(no_country, np.nan, rng.uniform(-60, 70, n_rows).round(4))
+    df["Lon"] = np.where(no_country, np.nan, rng.uniform(-180, 180, n_rows).round(4))
+
+    # Up to three gallery images per appearance
+    n_images = rng.choice(4, n_rows, p=[0.2, 0.4, 0.25, 0.15])
+    for i in range(1, 4):
+        df[f"Image_{i}"] = np.where(n_images >= i, "img" + df["ID"].astype(str) + f"_{i}", None)
+
+    # Long free text the app keeps out of raw_data
+    df["Summary"] = "A synthetic summary of the sequence. " * 4
+    df["Notes"] = None
+    df["Link_1"] = "https://en.wikipedia.org/wiki/" + df["Scientific_name"].str.replace(" ", "_")
+    df["Link_2"] = None
+    df["Link_3"] = None
+    df["Sentence_start"] = "Narrator: here we see"
+    df["Sentence_end"] = "and so life goes on."
+
+    for col in ["Air_date", "Species_lock_date"]:
+        df[col] = df[col].dt.date
+    return df[initial_cols]
+
+
+def generate_episodes(appearances, seed=0):
+    rng = np.random.default_rng(seed)
+    episodes = appearances[["Show", "Episode", "Air_date"]].drop_duplicates(subset=["Show", "Episode"]).reset_index(drop=True)
+    provider = pd.Series(rng.choice(["https://www.bbc.co.uk/iplayer/episode/", "https://www.netflix.com/title/", None],
+                                    len(episodes), p=[0.5, 0.3, 0.2]))
+    episodes["Streaming_link"] = (provider + episodes.index.astype(str)).astype(object)
+    return episodes
+
+
+def write_tables(tables, out_dir, file_format):
+    # Write each table where the matching local data source expects it
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if file_format == "sqlite":
+        path = out_dir / "wildlife.sqlite"
+        path.unlink(missing_ok=True)
+        with sqlite3.connect(path) as conn:
+            for name, table in tables.items():
+                table.astype({col: str for col in ["Air_date", "Species_lock_date"] if col in table}).to_sql(name, conn, index=False)
+        return
+    for name, table in tables.items():
+        if file_format == "parquet":
+            table.to_parquet(out_dir / f"{name}.parquet", index=False)
+        else:
+            table.to_csv(out_dir / f"{name}.csv", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic appearance and episode sheets.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["parquet", "csv", "sqlite"], default="parquet")
+    parser.add_argument("--out", type=Path, default=Path("data"))
+    args = parser.parse_args()
+
+    appearances = generate_appearances(args.rows, args.seed)
+    episodes = generate_episodes(appearances, args.seed)
+    write_tables({"appearances": appearances, "episodes": episodes}, args.out, args.format)
+    print(f"Wrote {len(appearances):,} appearances and {len(episodes):,} episodes to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from formatting import show_year_labels
+
+# Data for the Altair charts. Chart data is inlined into the Vega-Lite spec sent to the browser, so
+# each chart gets only the columns it encodes, one row per mark, rather than the appearance rows.
+
+# The locations map can be zoomed in, so points keep about 10 m of precision; coarser rounding
+# would move them and merge nearby filming sites into one point
+coordinate_decimals = 4
+
+
+def chart_frame(df):
+    # Categories are sent as plain values, so Altair does not have to sanitize every unused category
+    categorical = df.select_dtypes("category").columns
+    return df.astype({column: object for column in categorical}).reset_index(drop=True)
+
+
+def joined_labels(df, keys, label, separator=", "):
+    # One row per distinct key, with the distinct non-empty labels of its rows joined in order of appearance
+    rows = df[keys + [label]].drop_duplicates()
+    named = rows[rows[label].notna() & (rows[label] != "")].astype({label: str})
+    labels = named.groupby(keys, sort=False, observed=True, dropna=False)[label].agg(separator.join).reset_index()
+    return rows[keys].drop_duplicates().merge(labels, on=keys, how="left").fillna({label: ""})
+
+
+def location_points(animal_data):
+    # One point per place the animal was filmed, with the shows filmed there
+    points = animal_data[animal_data["Lon"].notna() & animal_data["Lat"].notna()]
+    points = pd.DataFrame({
+        "Lon": points["Lon"].round(coordinate_decimals),
+        "Lat": points["Lat"].round(coordinate_decimals),
+        "Country": points["Country"],
+        "Show": show_year_labels(points["Show"], points["Air date"]),
+    })
+    return chart_frame(joined_labels(points, ["Lon", "Lat", "Country"], "Show"))
+
+
+def timeline_points(animal_data):
+    # One point per year the animal appeared, with the shows it appeared in that year
+    years = pd.to_datetime(animal_data["Air date"]).dt.to_period("Y").dt.to_timestamp()
+    points = pd.DataFrame({
+        "Date": years,
+        "Animal": animal_data["Animal"],
+        "Show": show_year_labels(animal_data["Show"], animal_data["Air date"]),
+    }).dropna(subset=["Date"])
+    return chart_frame(joined_labels(points, ["Date", "Animal"], "Show"))
+
+
+def appearance_points(appearances, extra_columns=()):
+    # One point per animal and air date, with the shows aired that day; `extra_columns` are
+    # per-animal values such as the last appearance date that are carried along for encoding
+    points = appearances[["Air date", "Animal", *extra_columns]].assign(
+        Show=show_year_labels(appearances["Show"], appearances["Air date"])
+    )
+    return chart_frame(joined_labels(points, ["Air date", "Animal", *extra_columns], "Show"))
@@ -0,0 +1,56 @@
+import logging
+import unicodedata
+from pathlib import Path
+
+import iso3166
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Names used in the sheets that ISO 3166 spells differently. Add a row when a new spelling
+# shows up among the unresolved names in the logs.
+alias_path = Path(__file__).resolve().parent / "country_aliases.csv"
+
+
+def _normalize(name):
+    return " ".join(unicodedata.normalize("NFC", str(name)).casefold().split())
+
+
+def _build_country_ids():
+    # Every ISO name, apolitical name and alpha-2/alpha-3 code, then the aliases, mapped to the numeric code
+    ids = {}
+    for country in iso3166.countries:
+        for name in (country.alpha2, country.alpha3, country.name, country.apolitical_name):
+            ids[_normalize(name)] = int(country.numeric)
+    aliases = pd.read_csv(alias_path, dtype={"name": str, "numeric": int})
+    ids.update(zip(map(_normalize, aliases["name"]), aliases["numeric"]))
+    return pd.Series(ids, dtype="int64")
+
+
+country_ids = _build_country_ids()
+
+_reported = set()
+
+
+def resolve_countries(values, report=True):
+    # ISO 3166 numeric code for each country name, alias or code, <NA> where it is not recognised.
+    # Each distinct value is looked up once and the result is spread back over the rows.
+    values = pd.Series(values).astype("category")
+    keys = pd.Index([_normalize(name) for name in values.cat.categories])
+    ids = country_ids.reindex(keys).to_numpy(dtype=float)
+
+    codes = values.cat.codes.to_numpy()
+    resolved = np.where(codes >= 0, ids[codes] if len(ids) else np.nan, np.nan)
+    if report:
+        _report_unresolved(values.cat.categories[np.isnan(ids)])
+    return pd.Series(resolved, index=values.index).astype("Int64")
+
+
+def _report_unresolved(names):
+    # Logged once per process for each new name rather than on every call. Values listing several
+    # countries ("Kenya, Tanzania") have no single id by design, so only missing aliases are reported.
+    new_names = sorted({str(name) for name in names if "," not in str(name)} - _reported)
+    if new_names:
+        _reported.update(new_names)
+        logger.warning("%d country names without an ISO 3166 id, add them to %s: %s", len(new_names), alias_path.name, new_names)
@@ -0,0 +1,82 @@
+import threading
+
+import numpy as np
+
+from facets import FacetIndex
+from preprocessing import memoize
+from sketches import check_precision, default_precision, estimate, hash_values, register_updates
+
+cube_dims = ["Continent", "Country", "ISO3166 ID", "Class", "Family", "Species status", "Species status code"]
+
+
+class SpeciesCube:
+    """Distinct species per (Continent, Country, Class, Family, status) cell of raw_data.
+
+    Each cell keeps the set of species seen in it, stored flat as (cell, species code)
+    members. A sidebar selection picks cells through a facet index over the cells, and a
+    species count by any dimension is a distinct count over the members of those cells,
+    so the charts never rescan appearance rows.
+
+    With approximate=True the count instead merges a HyperLogLog sketch per cell, which
+    costs constant memory per cell however many species it holds.
+    """
+
+    def __init__(self, raw_data):
+        species = raw_data["Binomial name"].astype("category")
+        appearances = raw_data[cube_dims].assign(species=species.cat.codes.to_numpy())
+        appearances = appearances[appearances["species"] >= 0]
+
+        appearances["cell"] = appearances.groupby(cube_dims, observed=True, dropna=False, sort=False).ngroup()
+        members = appearances[["cell", "species"]].drop_duplicates()
+
+        # One row of dimension values per cell, at the position of its cell id
+        self.cells = appearances.drop_duplicates("cell").sort_values("cell")[cube_dims].reset_index(drop=True)
+        self.member_cells = members["cell"].to_numpy()
+        self.member_species = members["species"].to_numpy()
+        self.species_hashes = hash_values(species.cat.categories)
+        self.facets = FacetIndex(self.cells)
+
+        self._sketches = {}
+        self._sketches_lock = threading.Lock()
+
+    def sketches(self, precision=default_precision):
+        # HyperLogLog registers for every cell, built on first use for each precision
+        with self._sketches_lock:
+            if precision not in self._sketches:
+                check_precision(precision)
+                index, rank = register_updates(self.species_hashes[self.member_species], precision)
+                registers = np.zeros((len(self.cells), 1 << precision), dtype=np.uint8)
+                np.maximum.at(registers, (self.member_cells, index), rank)
+                self._sketches[precision] = registers
+            return self._sketches[precision]
+
+    def species_counts(self, selections, by, approximate=False, precision=default_precision):
+        # Distinct species per value of the `by` dimensions among the cells matching the selections
+        selected_cells = self.facets.mask(selections)
+        if approximate:
+            return self._approximate_species_counts(selected_cells, by, precision)
+
+        in_selection = selected_cells[self.member_cells]
+
+        members = self.cells.iloc[self.member_cells[in_selection]][by].reset_index(drop=True)
+        members["species"] = self.member_species[in_selection]
+
+        counts = members.drop_duplicates().groupby(by, observed=True).size()
+        return counts.rename("# Species").reset_index()
+
+    def _approximate_species_counts(self, selected_cells, by, precision):
+        cells = self.cells[selected_cells]
+        groups = cells.groupby(by, observed=True, sort=True).ngroup().to_numpy(dtype=float)
+        keep = ~np.isnan(groups)  # Cells with a missing `by` value are left out, as in an exact groupby
+        groups = groups[keep].astype(np.int64)
+
+        group_registers = np.zeros((groups.max() + 1 if len(groups) else 0, 1 << precision), dtype=np.uint8)
+        np.maximum.at(group_registers, groups, self.sketches(precision)[np.flatnonzero(selected_cells)[keep]])
+
+        counts = cells[keep][by].assign(group=groups).drop_duplicates("group").sort_values("group")
+        counts["# Species"] = np.rint(estimate(group_registers)).astype(int)
+        return counts.drop(columns="group").reset_index(drop=True)
+
+
+def species_cube(raw_data):
+    return memoize("species_cube", raw_data, SpeciesCube)
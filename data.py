@@ -0,0 +1,54 @@
+import hmac
+import os
+
+import streamlit as st
+
+from preprocessing import clear_cache
+from snapshot import SnapshotStore
+from sources import DATA_SOURCE, data_source
+from tables import frame_cache, html_cache
+
+# Merge keys and high-water mark column for each sheet's incremental refresh
+snapshot_config = {
+    "appearances": {"key_cols": ["ID"], "watermark_col": "Species_lock_date"},
+    "episodes": {"key_cols": ["Show", "Episode"], "watermark_col": "Air_date"},
+}
+
+# Editors publish sheet changes without waiting for the TTL by opening the app with ?refresh=<token>
+admin_token = os.environ.get("WOS_ADMIN_TOKEN")
+
+
+@st.cache_resource
+def get_snapshot_store(snapshot="appearances", backend=DATA_SOURCE):
+    config = snapshot_config[snapshot]
+    watermark_col = config["watermark_col"]
+    source = data_source(snapshot, backend)
+
+    return SnapshotStore(
+        snapshot,
+        lambda since: source.fetch(since, watermark_col),
+        key_cols=config["key_cols"],
+        watermark_col=watermark_col,
+        ttl=6000,
+    )
+
+
+def get_data(snapshot="appearances"):
+    return get_snapshot_store(snapshot).get()
+
+
+def handle_refresh_request():
+    # Admin-only: refetch every sheet in full and drop derived data, then drop the token from the URL
+    token = st.query_params.get("refresh")
+    if token is None:
+        return
+    del st.query_params["refresh"]
+    if not admin_token or not hmac.compare_digest(token, admin_token):
+        return
+
+    with st.spinner("Refreshing data from the sheets..."):
+        snapshots = {name: get_snapshot_store(name).invalidate() for name in snapshot_config}
+        clear_cache()
+        html_cache.clear()
+        frame_cache.clear()
+    st.toast(", ".join(f"{name}: {len(df):,} rows" for name, df in snapshots.items()), icon="✅")
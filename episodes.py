@@ -0,0 +1,48 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import memoize
+
+# Streaming providers recognised from an episode's streaming link, checked in order.
+# Add a provider by appending its name, link substrings and icon.
+streaming_providers = [
+    {"name": "BBC iPlayer",
+     "patterns": ["bbc"],
+     "icon": "https://iplayer-web.files.bbci.co.uk/page-builder/51.0.0/img/icons/favicon.ico"},
+    {"name": "Netflix",
+     "patterns": ["netflix"],
+     "icon": "https://assets.nflxext.com/ffe/siteui/common/icons/nficon2016.ico"},
+]
+
+# Provider assumed for links that match no pattern
+fallback_provider = "Netflix"
+
+
+def classify_providers(links):
+    # Provider name for each link, or None where there is no link
+    links = links.astype("string")
+    conditions = [links.str.contains("|".join(map(re.escape, provider["patterns"])), case=False, regex=True).fillna(False).to_numpy(dtype=bool)
+                  for provider in streaming_providers]
+    names = [provider["name"] for provider in streaming_providers]
+    providers = np.select(conditions, names, default=fallback_provider).astype(object)
+    providers[links.isna().to_numpy()] = None
+    return pd.Series(providers, index=links.index)
+
+
+def build_episode_index(df_episodes):
+    # Streaming link, provider and "Watch now" icon HTML per (Show, Episode)
+    episodes = df_episodes[["Show", "Episode", "Streaming_link"]].drop_duplicates(subset=["Show", "Episode"])
+    episodes = episodes.assign(Provider=classify_providers(episodes["Streaming_link"]))
+
+    icons = {provider["name"]: provider["icon"] for provider in streaming_providers}
+    icon = episodes["Provider"].map(icons)
+    watch_now = "<a href='" + episodes["Streaming_link"].astype("string") + "'><img src=" + icon.astype("string") + " width='15px'></a>"
+    episodes["Watch now"] = watch_now.astype(object).fillna("")
+
+    return episodes.set_index(["Show", "Episode"])
+
+
+def episode_index(df_episodes):
+    return memoize("episode_index", df_episodes, build_episode_index)
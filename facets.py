@@ -0,0 +1,77 @@
+import numpy as np
+
+from preprocessing import memoize
+
+facet_cols = ["Continent", "Country", "Class", "Family"]
+
+# Parent facet whose selection narrows the options of the child facet
+facet_parents = {"Country": "Continent", "Family": "Class"}
+
+
+class FacetIndex:
+    """Row-position bitsets for each sidebar facet value of raw_data.
+
+    Each value maps to a packed bitset over row positions, so a filter is an OR within
+    a facet and an AND across facets. Child option lists (countries per continent,
+    families per class) are precomputed so the cascading dropdowns are lookups.
+    """
+
+    def __init__(self, raw_data):
+        self.n_rows = len(raw_data)
+        self.bitsets = {col: self._build_bitsets(raw_data[col]) for col in facet_cols}
+        self.all_rows = np.packbits(np.ones(self.n_rows, dtype=bool))
+
+        self.child_options = {}
+        for child, parent in facet_parents.items():
+            pairs = raw_data[[parent, child]].dropna().drop_duplicates()
+            self.child_options[child] = {
+                parent_value: sorted(group[child].tolist())
+                for parent_value, group in pairs.groupby(parent, observed=True)
+            }
+
+    def _build_bitsets(self, column):
+        column = column.astype("category")
+        codes = column.cat.codes.to_numpy()
+        categories = column.cat.categories
+
+        # Group row positions by value with a single sort instead of one scan per value
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+
+        bitsets = {}
+        for i, value in enumerate(categories):
+            positions = order[bounds[i]:bounds[i + 1]]
+            if len(positions) == 0:
+                continue
+            rows = np.zeros(self.n_rows, dtype=bool)
+            rows[positions] = True
+            bitsets[value] = np.packbits(rows)
+        return bitsets
+
+    def options(self, col, parent_selection=None):
+        # Sorted options for a facet, narrowed to the selected parent values if any
+        if parent_selection and col in self.child_options:
+            by_parent = self.child_options[col]
+            return sorted({value for parent in parent_selection for value in by_parent.get(parent, [])})
+        return sorted(self.bitsets[col])
+
+    def rows(self, selections):
+        # Packed bitset of the rows matching every facet; an empty selection matches all rows
+        selected = self.all_rows
+        for col, values in selections.items():
+            if not values:
+                continue
+            facet_rows = np.zeros_like(self.all_rows)
+            for value in values:
+                if value in self.bitsets[col]:
+                    facet_rows |= self.bitsets[col][value]
+            selected = selected & facet_rows
+        return selected
+
+    def mask(self, selections):
+        # Boolean row mask for selections such as {"Continent": ["Africa"], "Family": []}
+        return np.unpackbits(self.rows(selections), count=self.n_rows).astype(bool)
+
+
+def facet_index(raw_data):
+    return memoize("facet_index", raw_data, FacetIndex)
@@ -0,0 +1,43 @@
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+date_format = "%-d %b %Y"
+
+
+def date_labels(dates, missing=""):
+    # "5 Mar 2021" style labels for a whole date column
+    return pd.to_datetime(dates).dt.strftime(date_format).astype(object).fillna(missing)
+
+
+def show_year_labels(shows, dates, missing=""):
+    # "Show (year)" labels, or `missing` where the air date is unknown
+    years = pd.to_datetime(dates).dt.strftime("%Y").astype("string")
+    labels = shows.astype("string") + " (" + years + ")"
+    return labels.astype(object).fillna(missing)
+
+
+def italic_names(names, missing=""):
+    return ("<i>" + names.astype("string") + "</i>").astype(object).fillna(missing)
+
+
+def status_badges(status_codes, status_css, css_class="ConservationStatusLabel", missing=""):
+    # Badge HTML is built once per distinct status code and looked up for every row
+    codes = status_codes.astype("category")
+    badges = {
+        code: f'<span style="{status_css.get(code, "")}" class="{css_class}">{code}</span>'
+        for code in codes.cat.categories
+    }
+    return codes.map(badges).astype(object).fillna(missing)
+
+
+@lru_cache(maxsize=4)
+def _stylesheet(path, modified):
+    with open(path) as css_file:
+        return f"<style>{css_file.read()}</style>"
+
+
+def stylesheet(path="style.css"):
+    # The page CSS as a <style> element, read from disk again only when the file changes
+    return _stylesheet(path, os.stat(path).st_mtime_ns)
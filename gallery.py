@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+from html import escape
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+from formatting import date_labels
+from preprocessing import memoize
+
+image_cols = ["Image 1", "Image 2", "Image 3"]
+image_base_url = "https://assets.wildlifeonscreen.com/Shows"
+
+# Above this many images an animal's gallery shows one image per appearance
+max_images_per_appearance_threshold = 6
+# Most recent images kept for prolific species
+max_gallery_images = 60
+
+# Thumbnails are produced offline by scripts/build_thumbnails.py and served as static files
+thumbnail_dir = Path(__file__).resolve().parent / "static" / "thumbnails"
+thumbnail_url = "app/static/thumbnails"
+thumbnail_heights = (150, 300)
+
+
+def _encode_path_segments(values):
+    # URL-encode each distinct show or episode name once rather than once per image
+    values = values.astype("category")
+    encoded = {value: quote(str(value), safe="") for value in values.cat.categories}
+    return values.map(encoded).astype(object)
+
+
+def build_image_manifest(raw_data):
+    # One row per image, indexed by animal, newest appearance first
+    appearances = raw_data.loc[raw_data["Image 1"].notna(), ["Animal", "Show", "Episode", "Air date"] + image_cols]
+    appearances = appearances.assign(appearance=appearances.index)
+
+    folder = (image_base_url + "/" + _encode_path_segments(appearances["Show"])
+              + "/" + _encode_path_segments(appearances["Episode"])
+              + "%20-%20" + date_labels(appearances["Air date"]).str.replace(" ", "%20"))
+    title = (appearances["Show"].astype(str) + " - " + appearances["Episode"].astype(str)
+             + " (" + appearances["Air date"].dt.strftime("%Y") + ")")
+    appearances = appearances.assign(folder=folder, title=title)
+
+    images = appearances.melt(
+        id_vars=["Animal", "appearance", "Air date", "folder", "title"],
+        value_vars=image_cols, var_name="slot", value_name="image"
+    ).dropna(subset=["image"])
+    images["url"] = images["folder"] + "/" + images["image"].astype(str).str.replace(" ", "%20") + ".webp"
+
+    images = images.sort_values(by=["Animal", "Air date", "appearance", "slot"], ascending=[True, False, False, True], kind="stable")
+    images = images.drop_duplicates(subset=["Animal", "url"])
+    return images[["Animal", "appearance", "slot", "title", "url"]].set_index("Animal")
+
+
+def image_manifest(raw_data):
+    return memoize("image_manifest", raw_data, build_image_manifest)
+
+
+def animal_images(manifest, animal):
+    # The sorted animal index makes this a binary search rather than a scan
+    if animal not in manifest.index:
+        return manifest.iloc[0:0]
+    return manifest.loc[[animal]]
+
+
+def sample_gallery(images, animal, version):
+    # Pick one image per appearance when there are many, seeded by animal and data version so the
+    # same animal always gets the same gallery for a given dataset
+    if len(images) > max_images_per_appearance_threshold:
+        seed = hashlib.sha1(f"{animal}|{version}".encode()).hexdigest()[:16]
+        scores = pd.util.hash_array(images["url"].to_numpy(dtype=object), hash_key=seed)
+        chosen = images.assign(score=scores).sort_values(by="score").drop_duplicates(subset=["appearance"])
+        images = images[images["url"].isin(chosen["url"])]
+    return images.head(max_gallery_images)
+
+
+def thumbnail_name(url, height):
+    return f"{hashlib.sha1(url.encode()).hexdigest()[:16]}-{height}.webp"
+
+
+_thumbnail_index = {"mtime": None, "entries": {}}
+
+
+def thumbnail_index_version():
+    index_path = thumbnail_dir / "index.json"
+    return os.path.getmtime(index_path) if index_path.exists() else None
+
+
+def thumbnail_index():
+    # Thumbnails available on disk, reloaded whenever the thumbnail build rewrites the index
+    mtime = thumbnail_index_version()
+    if mtime != _thumbnail_index["mtime"]:
+        entries = json.loads((thumbnail_dir / "index.json").read_text()) if mtime is not None else {}
+        _thumbnail_index.update(mtime=mtime, entries=entries)
+    return _thumbnail_index["entries"]
+
+
+def gallery_html(images, thumbnail_base=thumbnail_url):
+    thumbnails = thumbnail_index()
+    items = []
+    for title, url in zip(images["title"], images["url"]):
+        thumbnail = thumbnails.get(url)
+        if thumbnail is None:
+            img = f'<img src="{url}" alt="{escape(title)}" height="150px" loading="lazy" decoding="async">'
+        else:
+            srcset = ", ".join(f"{thumbnail_base}/{thumbnail[str(height)]} {height // thumbnail_heights[0]}x" for height in thumbnail_heights)
+            img = (f'<img src="{thumbnail_base}/{thumbnail[str(thumbnail_heights[0])]}" srcset="{srcset}" alt="{escape(title)}" '
+                   f'width="{thumbnail["width"]}px" height="150px" loading="lazy" decoding="async">')
+        items.append(f'<div class="image-container"><a href="{url}">{img}</a> <div class="popup-title"><span>{escape(title)}</span></div></div>')
+    return '<div class="scroll-container">' + "".join(items) + "</div>"
@@ -0,0 +1,106 @@
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+default_batch_size = 5000
+
+
+class ColumnBuffers:
+    """Accumulates rows batch by batch into one Arrow array chunk per column.
+
+    Only the current batch is ever held as Python row tuples, so peak memory while
+    ingesting stays close to the size of the finished frame. Columns whose values
+    cannot share an Arrow type (e.g. text and numbers mixed in one sheet column) are
+    kept as Python objects, matching what pandas would have built from the rows.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.chunks = {col: [] for col in self.columns}
+        self.object_cols = set()
+        self.n_rows = 0
+
+    def append_rows(self, rows):
+        if not rows:
+            return
+        for col, values in zip(self.columns, zip(*rows)):
+            self._append_values(col, values)
+        self.n_rows += len(rows)
+
+    def append_batch(self, batch):
+        for col in self.columns:
+            self._append_values(col, batch.column(col))
+        self.n_rows += batch.num_rows
+
+    def _append_values(self, col, values):
+        if col not in self.object_cols:
+            try:
+                self.chunks[col].append(values if isinstance(values, pa.Array) else pa.array(values, from_pandas=True))
+                return
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                self._to_objects(col)
+        self.chunks[col].append(values.to_pylist() if isinstance(values, pa.Array) else list(values))
+
+    def _to_objects(self, col):
+        self.object_cols.add(col)
+        self.chunks[col] = [chunk.to_pylist() if isinstance(chunk, pa.Array) else chunk for chunk in self.chunks[col]]
+
+    def _column(self, col):
+        chunks = self.chunks[col]
+        if col not in self.object_cols:
+            types = {chunk.type for chunk in chunks if chunk.type != pa.null()}
+            if types <= {pa.int64(), pa.float64()} and len(types) == 2:
+                types = {pa.float64()}
+            if len(types) <= 1:
+                target = types.pop() if types else pa.null()
+                return pa.chunked_array([chunk.cast(target) for chunk in chunks], type=target).to_pandas()
+            self._to_objects(col)
+        return pd.Series([value for chunk in self.chunks[col] for value in chunk], dtype=object)
+
+    def to_frame(self):
+        frame = pd.DataFrame({col: self._column(col) for col in self.columns})
+        self.chunks = {col: [] for col in self.columns}
+        return frame
+
+
+def _report(source, n_rows, progress):
+    logger.info("Ingested %s rows from %s", f"{n_rows:,}", source)
+    if progress is not None:
+        progress(n_rows)
+
+
+def ingest_cursor(cursor, source="cursor", batch_size=default_batch_size, progress=None):
+    # Pull a DB-API result set in batches rather than materializing every row first
+    buffers = ColumnBuffers(description[0] for description in cursor.description)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        buffers.append_rows(rows)
+        _report(source, buffers.n_rows, progress)
+    return buffers.to_frame()
+
+
+def ingest_csv(path, batch_size=default_batch_size, progress=None):
+    # Local stand-in for a sheet, read through the same row batches as the Sheets backend
+    buffers = None
+    for chunk in pd.read_csv(path, chunksize=batch_size):
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        if buffers is None:
+            buffers = ColumnBuffers(chunk.columns)
+        buffers.append_rows(list(chunk.itertuples(index=False, name=None)))
+        _report(path, buffers.n_rows, progress)
+    return buffers.to_frame() if buffers is not None else pd.DataFrame()
+
+
+def ingest_parquet(path, batch_size=default_batch_size, progress=None):
+    parquet_file = pq.ParquetFile(path)
+    buffers = ColumnBuffers(parquet_file.schema_arrow.names)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        buffers.append_batch(batch)
+        _report(path, buffers.n_rows, progress)
+    return buffers.to_frame()
@@ -1,490 +1,375 @@
 import streamlit as st
-from google.oauth2 import service_account
-from gsheetsdb import connect
-import pandas as pd
 import altair as alt
-from vega_datasets import data as vega_data
-import iso3166
-import random
-from datetime import datetime as dt
-
-random.seed(42)
+import os
+
+from animal_index import animal_index
+from animal_page import header_html, locations_chart, no_images_html, status_css, timeline_chart, timeline_headers, timeline_table
+from chart_data import appearance_points, chart_frame
+from cube import species_cube
+from data import get_data, handle_refresh_request
+from episodes import episode_index
+from facets import facet_index
+from formatting import status_badges, stylesheet
+from gallery import animal_images, gallery_html, image_manifest, sample_gallery, thumbnail_index_version
+from maps import countries
+import perf
+from preprocessing import data_version, preprocess
+from sketches import check_precision, default_precision
+from summaries import species_summary
+from tables import cached_frame, cached_table_html, html_cache, page_count, table_page
 
 sample_animal = "African bush elephant"
 
-with open("style.css") as css_file:
-    st.markdown(f'<style>{css_file.read()}</style>', unsafe_allow_html=True)
-
-st.write("""<br>""", unsafe_allow_html=True)
-
-status_order = ["Least Concern",
-                "Near Threatened",
-                "Vulnerable",
-                "Endangered",
-                "Critically Endangered",
-                "Extinct",
-                "Domesticated",
-                "Data Deficient",
-                "Not Evaluated"]
-
-status_colours = {
-    "Least Concern": "#63c5ff",
-    "Near Threatened": "#7af054",
-    "Vulnerable": "#e5cb50",
-    "Endangered": "#ffa759",
-    "Critically Endangered": "#f65f54",
-    "Domesticated": "#9C826C",
-    "Data Deficient": "#b9b9b9",
-    "Not Evaluated": "#b9b9b9",
-    "Extinct": "#363636"
-}
-
-status_code_labels = {
-    "LC": "Least Concern",
-    "NT": "Near Threatened",
-    "VU": "Vulnerable",
-    "EN": "Endangered",
-    "CR": "Critically Endangered",
-    "DO": "Domesticated",
-    "DD": "Data Deficient",
-    "NE": "Not Evaluated",
-    "EX": "Extinct"
-}
-
-status_css = {
-    'LC': 'background-color: #4fc1ff; border: 2px solid #3a95d1; color: #ffffff; text-shadow: 0px 0px 1px #3283b5;',
-    'NT': 'background-color: #67d62f; border: 2px solid #4cb517; color: #ffffff; text-shadow: 0px 0px 1px #47a315;',
-    'VU': 'background-color: #d6ba18; border: 2px solid #cfa715; color: #ffffff; text-shadow: 0px 0px 1px #c28b00;',
-    'EN': 'background-color: #ff9123; border: 2px solid #c48e21; color: #ffffff; text-shadow: 0px 0px 1px #b38220;',
-    'CR': 'background-color: #f03022; border: 2px solid #a8482b; color: #ffffff; text-shadow: 0px 0px 1px #7d3a25;',
-    'NE': 'background-color: #ffffff; border: 2px solid #ebebeb; color: #000000; text-shadow: 0px 0px 2px #ffffff;',
-    'DD': 'background-color: #ffffff; border: 2px solid #ebebeb; color: #000000; text-shadow: 0px 0px 2px #ffffff;',
-    'DO': 'background-color: #9C826C; border: 2px solid #85552c; color: #ffffff; text-shadow: 0px 0px 2px #444444;',
-    'EX': 'background-color: #363636; border: 2px solid #ff4647; color: #ffffff; text-shadow: 0px 0px 2px #000000;',
-}
-
-countries = alt.topo_feature(vega_data.world_110m.url, 'countries')
-
-@st.cache_resource(ttl=6000)
-def get_data(sheet_url):
-    credentials = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=["https://www.googleapis.com/auth/spreadsheets"],
-    )
-    conn = connect(credentials=credentials)
-
-    # Fetch data from the Google Sheet.
-    raw = conn.execute(f'SELECT * FROM "{sheet_url}"')
-    # Convert the data to a pandas DataFrame.
-    df = pd.DataFrame(raw)
-
-    return df
-
-
-sheet_url = st.secrets["private_gsheets_url"]
-sheet_url_episodes = st.secrets["private_gsheets_url_episodes"]
-
-df = get_data(sheet_url)
-df_episodes = get_data(sheet_url_episodes)
-
-initial_cols = ["Appearance_number",
-                "Coappearance_number",
-                "Other_animals",
-                "Show",
-                "Episode",
-                "Air_date",
-                "Is_New",
-                "ID",
-                "Image_1",
-                "Image_2",
-                "Image_3",
-                "Sequence_number",
-                "Animal_name",
-                "Animal_name_original",
-                "Scientific_name",
-                "Species_status",
-                "Species_status_original",
-                "Class",
-                "Family",
-                "Species_lock_date",
-                "Summary",
-                "Location",
-                "Country",
-                "Country_code",
-                "Continent",
-                "Scientific_advisor",
-                "Notes",
-                "Link_1",
-                "Link_2",
-                "Link_3",
-                "Lat",
-                "Lon",
-                "Sentence_start",
-                "Sentence_end",
-                "Animal_group"
-                ]
-
-raw_data = df[initial_cols].copy()
-
-# ------------- PRE-PROCESSING ------------ #
-
-# Renaming columns
-column_mapping = {col: col.replace("_", " ") for col in raw_data.columns}
-raw_data.rename(columns=column_mapping, inplace=True)
-
-raw_data.rename(columns={'Species status': 'Subspecies status code',
-                     'Species status original': 'Species status code',
-                     'Animal name original': 'Animal',
-                     'Animal name': 'Animal subspecies',
-                     'Appearance number': '# Appearances'
-                         },
-                inplace=True)
-
-# Get binomial name where scientific name contains trinomial name
-raw_data["Binomial name"] = raw_data["Scientific name"].str.split().str[:2].str.join(" ")
-
-# Map species status codes to full status names
-raw_data["Species status"] = raw_data["Species status code"].map(status_code_labels)
-raw_data["Subspecies status"] = raw_data["Subspecies status code"].map(status_code_labels)
-
-# Get ISO3166 ID using country code
-country_mapping = {c.alpha3: int(c.numeric.lstrip('0')) for c in iso3166.countries}
-raw_data["ISO3166 ID"] = raw_data["Country code"].replace(country_mapping)
-
-# Remove indeterminate species
-raw_data = raw_data[~raw_data["Animal"].apply(lambda x: isinstance(x, str) and "sp." in x)]
-
-
-animal_tab, location_tab = st.tabs(["Search by animal", "Search by location"])
-
-# ------------- USER SELECTION ------------ #
-
-# Filter based on user selections
-unique_continents = sorted(raw_data["Continent"].dropna().unique())
-unique_countries = sorted(raw_data["Country"].dropna().unique())
-unique_classes = sorted(raw_data["Class"].dropna().unique())
-unique_families = sorted(raw_data["Family"].dropna().unique())
-
-# Apply continent filter to country selection options
-continents_selection = st.sidebar.multiselect("Filter animals by continent", unique_continents, [])
-if continents_selection:
-    unique_countries = sorted(raw_data.loc[raw_data["Continent"].isin(continents_selection), "Country"].dropna().unique())
-
-countries_selection = st.sidebar.multiselect("Filter animals by country", unique_countries, [])
-
-# Apply class filter to family selection options
-class_selection = st.sidebar.multiselect("Filter animals by taxon classes", unique_classes, [])
-if class_selection:
-    unique_families = sorted(raw_data.loc[raw_data["Class"].isin(class_selection), "Family"].dropna().unique())
-
-families_selection = st.sidebar.multiselect("Filter animals by taxon families", unique_families, [])
-
-# Create filter conditions based on user selections
-continents_filter = raw_data["Continent"].isin(continents_selection) | (len(continents_selection) == 0)
-countries_filter = (raw_data["Country"].isin(countries_selection)) | (len(countries_selection) == 0)
-class_filter = (raw_data["Class"].isin(class_selection)) | (len(class_selection) == 0)
-family_filter = (raw_data["Family"].isin(families_selection)) | (len(families_selection) == 0)
-
-st.sidebar.markdown("""---""")
-
-unique_animals = sorted(raw_data["Animal"].dropna().unique())
-
-with animal_tab:
-    if (len(continents_selection) == 0) & (len(countries_selection) == 0) & (len(class_selection) == 0) & (len(families_selection) == 0):
-        animal_selection = st.selectbox(f"Choose from {len(unique_animals):,} animal species from dropdown or via filters in sidebar", unique_animals, unique_animals.index(sample_animal))
-    else:
-        filtered_animals = raw_data.loc[continents_filter & countries_filter & class_filter & family_filter, "Animal"].dropna().unique()
-        unique_animals = sorted(filtered_animals)
-        animal_selection = st.selectbox(f"Choose from {len(unique_animals):,} animal species from dropdown or via filters in sidebar", unique_animals)
-
-        st.markdown("""---""")
-
-    animal_data = raw_data.loc[raw_data["Animal"] == f"{animal_selection}"].copy().sort_values(by=["Air date"])
-
-    if len(animal_data) == 0:
-        st.write("<h1 style='color: darkgrey;'>No animals match all filters.</h1><h6 style='color: darkgrey;'>Try expanding your search criteria.</h6>", unsafe_allow_html=True)
-    else:
-        # ------------- RENDER DATA ------------ #
-
-        binomial_name = animal_data["Binomial name"].iloc[0]
-        species_status= animal_data["Species status"].iloc[0]
-        species_status_code = animal_data["Species status code"].iloc[0]
-        last_updated_at = animal_data["Species lock date"].sort_values().iloc[-1]  # Get last Species lock date
-        st.write(f'<div class="animal-header"><h1 style="padding:0px;">{animal_selection}</h1><span style="text-align:right;"><h6 style="opacity:0.5; padding:0px"><i>Updated: {last_updated_at.strftime("%-d %b %Y")}</i></h6></span></div>', unsafe_allow_html=True)
-        st.write(f'<div class="animal-info-header"><h5 style="padding:0px;"><i>{binomial_name}</i></h5> <span style="{status_css.get(species_status_code, "")}" class="ConservationStatusLabelLarge">{species_status}</span></div>' if species_status is not None else "", unsafe_allow_html=True)
+species_page_size = 50
+
+# Overview charts over the unfiltered dataset may use approximate HyperLogLog species counts
+approximate_counts = os.environ.get("WOS_APPROXIMATE_COUNTS") == "1"
+count_precision = check_precision(int(os.environ.get("WOS_COUNT_PRECISION", default_precision)))
+
+perf.start_run("main")
+# Finished even when the page raises, so later fragment reruns are timed on their own
+try:
+    st.markdown(stylesheet(), unsafe_allow_html=True)
+
+    st.write("""<br>""", unsafe_allow_html=True)
+
+    status_order = ["Least Concern",
+                    "Near Threatened",
+                    "Vulnerable",
+                    "Endangered",
+                    "Critically Endangered",
+                    "Extinct in the Wild",
+                    "Extinct",
+                    "Domesticated",
+                    "Data Deficient",
+                    "Not Evaluated"]
+
+    status_colours = {
+        "Least Concern": "#63c5ff",
+        "Near Threatened": "#7af054",
+        "Vulnerable": "#e5cb50",
+        "Endangered": "#ffa759",
+        "Critically Endangered": "#f65f54",
+        "Extinct in the Wild": "#542344",
+        "Domesticated": "#9C826C",
+        "Data Deficient": "#b9b9b9",
+        "Not Evaluated": "#b9b9b9",
+        "Extinct": "#363636"
+    }
+
+    with perf.stage("get data") as timing:
+        handle_refresh_request()
+        df = get_data()
+        df_episodes = get_data("episodes")
+        episodes = episode_index(df_episodes)
+        timing.rows = len(df)
+
+    # ------------- PRE-PROCESSING ------------ #
+
+    with perf.stage("preprocess") as timing:
+        raw_data = preprocess(df)
+        timing.rows = len(raw_data)
+
+    # Streamlit forgets the state of widgets that are not rendered, so the selections made in the
+    # closed tab are carried over until it is opened again
+    for widget_key in ("animal_selection", "timeline_sort", "species_sort"):
+        if widget_key in st.session_state:
+            st.session_state[widget_key] = st.session_state[widget_key]
+    st.session_state.setdefault("animal_selection", sample_animal)
+
+    # Tabs rerun the script when switched, so only the open tab's content is computed
+    animal_tab, location_tab = st.tabs(["Search by animal", "Search by location"], key="tab", on_change="rerun")
+
+    # ------------- USER SELECTION ------------ #
+
+    # Filter based on user selections
+    facets = facet_index(raw_data)
+    unique_continents = facets.options("Continent")
+    unique_classes = facets.options("Class")
+
+    # Apply continent filter to country selection options
+    continents_selection = st.sidebar.multiselect("Filter animals by continent", unique_continents, [])
+    unique_countries = facets.options("Country", continents_selection)
+
+    countries_selection = st.sidebar.multiselect("Filter animals by country", unique_countries, [])
+
+    # Apply class filter to family selection options
+    class_selection = st.sidebar.multiselect("Filter animals by taxon classes", unique_classes, [])
+    unique_families = facets.options("Family", class_selection)
+
+    families_selection = st.sidebar.multiselect("Filter animals by taxon families", unique_families, [])
+
+    # Create filter mask based on user selections
+    selections = {"Continent": continents_selection,
+                  "Country": countries_selection,
+                  "Class": class_selection,
+                  "Family": families_selection}
+    with perf.stage("filter masks") as timing:
+        selection_filter = facets.mask(selections)
+        timing.rows = int(selection_filter.sum())
+
+    st.sidebar.markdown("""---""")
+
+
+    def render_animal_tab():
+        animals = animal_index(raw_data)
+        unique_animals = animals.animals
+
+        if (len(continents_selection) == 0) & (len(countries_selection) == 0) & (len(class_selection) == 0) & (len(families_selection) == 0):
+            animal_selection = st.selectbox(f"Choose from {len(unique_animals):,} animal species from dropdown or via filters in sidebar", unique_animals, key="animal_selection")
+        else:
+            filtered_animals = raw_data.loc[selection_filter, "Animal"].dropna().unique()
+            unique_animals = sorted(filtered_animals)
+            animal_selection = st.selectbox(f"Choose from {len(unique_animals):,} animal species from dropdown or via filters in sidebar", unique_animals, key="animal_selection")
 
-        animal_data = animal_data.drop_duplicates().reset_index(drop=True)
-        animal_data.index += 1
+            st.markdown("""---""")
 
-        # ------------- GALLERY ------------ #
-        st.markdown(f"<div class='section-banner'><h5>Image Gallery</h5></div>", unsafe_allow_html=True)
-        
-        image_paths = []
+        with perf.stage("animal selection") as timing:
+            animal_data = animals.rows(animal_selection)
+            timing.rows = len(animal_data)
 
-        total_images_count = animal_data[["Image 1", "Image 2", "Image 3"]].notnull().sum(axis=1).sum()
+        if len(animal_data) == 0:
+            st.write("<h1 style='color: darkgrey;'>No animals match all filters.</h1><h6 style='color: darkgrey;'>Try expanding your search criteria.</h6>", unsafe_allow_html=True)
+        else:
+            # ------------- RENDER DATA ------------ #
 
-        for _, row in animal_data[::-1].iterrows():
-            if row["Image 1"] is not None:
-                show = row["Show"]
-                episode = row["Episode"]
-                air_date = row["Air date"].strftime("%-d %b %Y")
-                air_year = row["Air date"].strftime("%Y")
+            header, info = header_html(animal_selection, animal_data)
+            st.write(header, unsafe_allow_html=True)
+            st.write(info, unsafe_allow_html=True)
 
-                if total_images_count <= 6:
-                    selected_images = [value for value in [row["Image 1"], row["Image 2"], row["Image 3"]] if
-                                       value is not None]
-                else:
-                    selected_images = [random.choice(
-                        [value for value in [row["Image 1"], row["Image 2"], row["Image 3"]] if value is not None])]
+            animal_data = animal_data.drop_duplicates().reset_index(drop=True)
+            animal_data.index += 1
 
-                for image in selected_images:
-                    path = f"https://assets.wildlifeonscreen.com/Shows/{show.replace(' ', '%20')}/{episode.replace(' ', '%20')}%20-%20{air_date.replace(' ', '%20')}/{image}.webp"
-                    image_paths.append([show, episode, air_year, path])
+            # ------------- GALLERY ------------ #
+            st.markdown(f"<div class='section-banner'><h5>Image Gallery</h5></div>", unsafe_allow_html=True)
+        
+            with perf.stage("gallery") as timing:
+                images = sample_gallery(animal_images(image_manifest(raw_data), animal_selection), animal_selection, data_version(raw_data))
+                timing.rows = len(images)
 
-        if len(image_paths) == 0:
-            st.write(
-                "<div style='text-align:center;'><h6 style='color: darkgrey;'><i>Images not yet available. Check back soon.</i></h6></div>",
-                unsafe_allow_html=True)
-        else:
-            st.write(
-                '<div class="scroll-container">'
-                + "".join(
-                    f'<div class="image-container"><a href="{image[3]}"><img src="{image[3]}" alt="{image[0] + " - " + image[1] + " (" + image[2] + ")"}" height="150px"></a> <div class="popup-title"><span>{image[0] + " - " + image[1] + " (" + image[2] + ")"}</span></div></div>'
-                    for image in image_paths
-                )
-                + "</div>",
-                unsafe_allow_html=True,
-            )
-        # ------------- MAP ------------ #
-
-        st.markdown(f"<div class='section-banner'><h5>Locations</h5></div>", unsafe_allow_html=True)
-
-        countries_map = alt.Chart(countries).mark_geoshape(
-            fill='#353535',
-            stroke='#686868',
-            strokeWidth=0.3
-        ).encode(
-            tooltip=alt.value(None),
-        ).project('naturalEarth1').interactive()
-
-        points_df = animal_data[(animal_data['Lon'].notna()) & (animal_data['Lat'].notna())].copy()
-        if not points_df.empty:
-            points_df["Show"] = points_df.apply(lambda x: f'{x["Show"]} ({x["Air date"].strftime("%Y")})', axis=1)
-
-            points = alt.Chart(points_df).mark_circle(opacity=0.5, color='#EDCB0D').encode(
-                longitude='Lon:Q',
-                latitude='Lat:Q',
-                size=alt.value(50),
-                tooltip=[alt.Tooltip('Country:N'), alt.Tooltip('Show:N')]
-            ).interactive()
-
-            st.altair_chart(countries_map + points, use_container_width=True)
-        else:
-            st.altair_chart(countries_map, use_container_width=True)
+                if len(images) == 0:
+                    st.write(no_images_html, unsafe_allow_html=True)
+                else:
+                    gallery = html_cache.get_or_render(
+                        ("gallery", data_version(raw_data), thumbnail_index_version(), animal_selection),
+                        lambda: gallery_html(images)
+                    )
+                    timing.bytes = len(gallery)
+                    st.write(gallery, unsafe_allow_html=True)
+            # ------------- MAP ------------ #
 
-        # ------------- TABLE ------------ #
+            st.markdown(f"<div class='section-banner'><h5>Locations</h5></div>", unsafe_allow_html=True)
 
-        st.markdown(f"<div class='section-banner' style='margin-top:-20px;'><h5>Timeline of Appearances</h5></div>", unsafe_allow_html=True)
+            with perf.stage("locations map") as timing:
+                timing.rows = len(animal_data)
+                st.altair_chart(locations_chart(animal_data), use_container_width=True)
 
-        table_data = animal_data.copy()
+            # ------------- TABLE ------------ #
 
-        table_headers = ["Date",
-                         "Show",
-                         "Episode",
-                         "Watch now",
-                         "Country",
-                         "Continent"]
+            st.markdown(f"<div class='section-banner' style='margin-top:-20px;'><h5>Timeline of Appearances</h5></div>", unsafe_allow_html=True)
 
-        if len(table_data["Animal subspecies"].unique()) > 1:
-            table_data.rename(columns={'Animal subspecies': 'Name'}, inplace=True)
-            table_data["Scientific name"] = table_data["Scientific name"].map(lambda x: f"<i>{x}</i>" if x is not None else "")
-            table_data["IUCN status"] = table_data["Subspecies status code"].map(lambda x: f'<span style="{status_css.get(x, "")}" class="ConservationStatusLabel">{x}</span>' if x is not None else "")
-            table_headers.extend(["Name", "Scientific name", "IUCN status"])
+            with perf.stage("timeline chart") as timing:
+                timing.rows = len(animal_data)
+                st.altair_chart(timeline_chart(animal_data), use_container_width=True)
 
-        table_data["Date"] = table_data["Air date"].apply(lambda x: x.strftime("%-d %b %Y"))
+            render_timeline_table(animal_selection, animal_data)
 
-        table_data["Country"] = table_data["Country"].apply(lambda x: x if x is not None else "")
 
-        table_data = table_data.merge(df_episodes[["Show", "Episode", "Streaming_link"]], on=["Show", "Episode"], how="left")
+    # Changing the sort reruns only this fragment; the header, gallery, map and chart are left as they are
+    @perf.fragment("main timeline table")
+    def render_timeline_table(animal_selection, animal_data):
+        user_sort_selection = st.radio(label="Sort Appearances by:", options=tuple(timeline_headers(animal_data)),
+                                       horizontal=True, key="timeline_sort")
+
+        with perf.stage("timeline table") as timing:
+            html_table = cached_table_html(
+                ("timeline", data_version(raw_data), data_version(df_episodes), animal_selection, user_sort_selection),
+                lambda: timeline_table(animal_data, episodes, user_sort_selection)
+            )
+            timing.bytes = len(html_table)
+            st.markdown(f"<div class='species_table'>{html_table}</div>", unsafe_allow_html=True)
 
-        table_data["Watch now"] = table_data["Streaming_link"].apply(lambda x: f"<a href='{x}'><img src={'https://iplayer-web.files.bbci.co.uk/page-builder/51.0.0/img/icons/favicon.ico' if (not pd.isna(x) and 'bbc' in x) else 'https://assets.nflxext.com/ffe/siteui/common/icons/nficon2016.ico'} width='15px'></a>" if x is not None else "")
 
-        user_sort_selection = st.sidebar.radio(label="Sort Appearances by:",
-                                               options=tuple(table_headers))
+    def render_location_tab():
+        with perf.stage("species cube") as timing:
+            filtered_df = raw_data[selection_filter].copy()
+            cube = species_cube(raw_data)
+            timing.rows = len(filtered_df)
+        approximate = approximate_counts and not any(selections.values())
 
-        if user_sort_selection == "IUCN status":
-            table_data.sort_values(by="Subspecies status code", key=lambda x: pd.Categorical(x, categories=status_order, ordered=True), inplace=True)
-        elif user_sort_selection == "Date":
-            table_data.sort_values(by="Air date", inplace=True)
+        if len(filtered_df) == 0:
+            st.write(
+                "<h1 style='color: darkgrey;'>No animals match all filters.</h1><h6 style='color: darkgrey;'>Try expanding your search criteria.</h6>",
+                unsafe_allow_html=True)
         else:
-            table_data.sort_values(by=user_sort_selection, inplace=True)
-
-        table_data["Show"] = table_data.apply(
-            lambda x: f'{x["Show"]} ({x["Air date"].strftime("%Y")})' if x["Air date"] is not None else "", axis=1)
-
-        animal_dot_plot_chart = alt.Chart(
-            data=table_data
-        ).mark_line(strokeDash=[4, 1], color="#353535").encode(
-            x=alt.X("year(Date):T", title="", scale=alt.Scale(domain=[table_data["Air date"].min().year, dt.now().year])),
-            y=alt.Y("Animal:N", title="", axis=alt.Axis(labels=False)),
-            detail="Animal:N",
-        ).properties(height=80)
-
-        dots = alt.Chart(table_data).mark_circle(size=200, opacity=1).encode(
-        # dots = alt.Chart(table_data).mark_point(size=100, opacity=1, shape="triangle-right", strokeWidth=6).encode(
-            x=alt.X("year(Date):T", title="", scale=alt.Scale(domain=[table_data["Air date"].min().year, dt.now().year])),
-            y=alt.Y("Animal:N", title="", axis=alt.Axis(labels=False)),
-            tooltip=[alt.Tooltip('Show:N')],
-            color=alt.Color('year(Date):N', scale=alt.Scale(scheme="goldred"), sort="descending", legend=None),
-        )
+            st.markdown(f"<div class='section-banner'><h5>Species by IUCN Status</h5></div>", unsafe_allow_html=True)
+
+            with perf.stage("status chart") as timing:
+                status_chart_df = cube.species_counts(selections, ["Species status"], approximate, count_precision)
+                status_chart_df.columns = ["IUCN status", "# Species"]
+                timing.rows = len(status_chart_df)
 
-        st.altair_chart(animal_dot_plot_chart + dots, use_container_width=True)
+                status_chart = alt.Chart(status_chart_df).encode(
+                    x=alt.X("# Species", axis=alt.Axis(title="# Species", titleFont="Fira Sans Condensed", labelFont="Fira Sans Condensed", labelOverlap=True, tickMinStep=1)),
+                    y=alt.Y("IUCN status", axis=alt.Axis(title="", titleFont="Fira Sans Condensed", labelFont="Fira Sans Condensed"), sort=status_order),
+                    color=alt.Color("IUCN status", scale=alt.Scale(domain=list(status_colours.keys()), range=list(status_colours.values())), legend=None),
+                )
 
-        html_table = table_data[table_headers].drop_duplicates().to_html(escape=False, index=False, classes=['styled-table', 'table-sortable'])
+                st.altair_chart(status_chart.mark_bar())
+
+            st.markdown(f"<div class='section-banner'><h5>Species by Country</h5></div>", unsafe_allow_html=True)
+
+            with perf.stage("country charts") as timing:
+                # The bar chart counts by country name, so countries without an ISO 3166 id (e.g. "Kenya, Tanzania")
+                # are still counted; only the choropleth needs the id to find each country's shape
+                country_df = cube.species_counts(selections, ["Country"], approximate, count_precision)
+                country_df.columns = ["Country", "NumSpecies"]
+                chloropleth_df = cube.species_counts(selections, ["Country", "ISO3166 ID"], approximate, count_precision)
+                chloropleth_df.columns = ["Country", "ISO3166 ID", "NumSpecies"]
+                timing.rows = len(country_df)
+
+                # Sort the DataFrame based on "Unique_BinomialName_Count" in descending order
+                sorted_country_df = country_df.sort_values(by="NumSpecies", ascending=False)
+
+                # Reset the index and create a new column with row numbers
+                sorted_country_df['RowNumber'] = range(1, len(sorted_country_df) + 1)
+                sorted_country_df.reset_index(drop=True, inplace=True)
+
+                n = 10
+                colour_scheme = "goldgreen"
+                # Create two columns for the charts
+                col1, col2 = st.columns([0.3, 0.7])
+
+                # Chart 1 - Bar Chart
+                with col1:
+                    country_chart = alt.Chart(chart_frame(sorted_country_df.head(n)[['Country', 'NumSpecies', 'RowNumber']])).mark_bar().encode(
+                        y=alt.Y('Country',
+                                axis=alt.Axis(title=f'Top {n} countries', titleFont="Fira Sans Condensed", labelFontSize=12,
+                                              labelFont="Fira Sans Condensed", labelOverlap=True), sort="-x"),
+                        x=alt.X('NumSpecies',
+                                axis=alt.Axis(title='# Species', titleFont="Fira Sans Condensed", labelFont="Fira Sans Condensed",
+                                              labelOverlap=True, tickMinStep=1)),
+                        color=alt.Color('RowNumber', scale=alt.Scale(scheme=colour_scheme), sort="descending", legend=None),
+                        tooltip=[
+                            alt.Tooltip('Country:N'),
+                            alt.Tooltip('NumSpecies:Q', title='# Species')
+                        ]
+                    ).properties(height=300)
+                    st.altair_chart(country_chart, use_container_width=True)
+
+                # Chart 2 - Choropleth Map
+                with col2:
+                    country_map = alt.Chart(countries).mark_geoshape(
+                        stroke='#353535',
+                        strokeWidth=0.3
+                    ).transform_lookup(
+                        lookup='id',
+                        from_=alt.LookupData(data=chart_frame(chloropleth_df[['ISO3166 ID', 'NumSpecies', 'Country']]), key='ISO3166 ID', fields=['NumSpecies', 'Country'])
+                    ).transform_calculate(
+                        NumSpecies='isValid(datum.NumSpecies) ? datum.NumSpecies : -1',
+                    ).encode(
+                        color=alt.condition('datum.NumSpecies > 0',
+                                            alt.Color('NumSpecies:Q', scale=alt.Scale(scheme=colour_scheme), sort="ascending",
+                                                      legend=None),
+                                            alt.value('#242424')
+                                            ),
+                        tooltip=[
+                            alt.Tooltip('Country:N'),
+                            alt.Tooltip('NumSpecies:Q', title='# Species')
+                        ]
+                    ).project(
+                        "naturalEarth1"
+                    ).properties(height=250)
+
+                    st.altair_chart(country_map, use_container_width=True)
+
+            st.markdown(f"<div class='section-banner'><h5>List of Species</h5></div>", unsafe_allow_html=True)
+
+            render_species_list(filtered_df, selections)
+
+            st.markdown(f"<div class='section-banner'><h5>Species appearances over time</h5></div>", unsafe_allow_html=True)
+
+            # Order the filtered animals by when their species last appeared and keep the most recent
+            max_animals_to_display = 20
+            with perf.stage("species over time chart") as timing:
+                summary = species_summary(raw_data)
+                last_appearance_order = filtered_df[["Animal", "Binomial name"]].drop_duplicates().join(
+                    summary["Last Appeared Date"], on="Binomial name"
+                ).sort_values(by="Last Appeared Date", ascending=False, kind="stable")
+                most_recent_animals = last_appearance_order["Animal"].drop_duplicates().head(max_animals_to_display).tolist()
+
+                # Join the last appearance only onto the rows that are plotted, then keep one point per air date
+                dot_plot_df = appearance_points(
+                    filtered_df[filtered_df["Animal"].isin(most_recent_animals)].join(summary["Last Appeared Date"], on="Binomial name"),
+                    ["Last Appeared Date"]
+                ).sort_values(by="Air date", ascending=False)
+                timing.rows = len(dot_plot_df)
+
+                dot_plot_chart = alt.Chart(
+                    data=dot_plot_df
+                ).mark_line(color='#96b3bdff', point=True, strokeDash=[4, 1]).encode(
+                    x=alt.X("Air date:T", title=""),
+                    y=alt.Y("Animal:N", title="", sort=most_recent_animals, axis=alt.Axis(labelLimit=200)),
+                    detail="Animal:N",
+                    tooltip=[alt.Tooltip('Animal:N'), alt.Tooltip('Show:N')],
+                    color=alt.Color('Last Appeared Date:N', scale=alt.Scale(scheme="goldred"), sort="descending", legend=None)
+                ).configure_point(
+                    size=100,
+                    color='#63c5ff'
+                )
 
-        st.markdown(f"<div class='species_table'>{html_table}</div>", unsafe_allow_html=True)
+                st.altair_chart(dot_plot_chart, use_container_width=True)
 
-with location_tab:
-    filtered_df = raw_data[continents_filter & countries_filter & class_filter & family_filter].copy()
 
-    if len(filtered_df) == 0:
-        st.write(
-            "<h1 style='color: darkgrey;'>No animals match all filters.</h1><h6 style='color: darkgrey;'>Try expanding your search criteria.</h6>",
-            unsafe_allow_html=True)
-    else:
-        st.markdown(f"<div class='section-banner'><h5>Species by IUCN Status</h5></div>", unsafe_allow_html=True)
+    # Sorting and paging rerun only this fragment, reusing the filtered rows from the last full run
+    @perf.fragment("main species list")
+    def render_species_list(filtered_df, selections):
+        species_sort_columns = {
+            "Animal": ["Animal", "Binomial name"],
+            "Scientific name": ["Binomial name", "Animal"],
+            "IUCN status": ["Species status code", "Animal"],
+        }
+        species_key = ("species_list", data_version(raw_data)) + tuple(tuple(selected) for selected in selections.values())
 
-        status_chart_df = filtered_df.groupby("Species status").agg({
-            "Binomial name": "nunique"
-        }).reset_index()
-        status_chart_df.columns = ["IUCN status", "# Species"]
+        sort_col, page_col = st.columns([0.7, 0.3])
+        species_sort_selection = sort_col.selectbox("Sort species by", tuple(species_sort_columns), key="species_sort")
 
-        status_chart = alt.Chart(status_chart_df).encode(
-            x=alt.X("# Species", axis=alt.Axis(title="# Species", titleFont="Fira Sans Condensed", labelFont="Fira Sans Condensed", labelOverlap=True, tickMinStep=1)),
-            y=alt.Y("IUCN status", axis=alt.Axis(title="", titleFont="Fira Sans Condensed", labelFont="Fira Sans Condensed"), sort=status_order),
-            color=alt.Color("IUCN status", scale=alt.Scale(domain=list(status_colours.keys()), range=list(status_colours.values())), legend=None),
+        # Species are deduplicated and sorted once per filter and sort state, then rendered a page at a time
+        species_df = cached_frame(
+            species_key + (species_sort_selection,),
+            lambda: filtered_df[["Animal", "Binomial name", "Species status code"]].drop_duplicates().sort_values(
+                by=species_sort_columns[species_sort_selection], kind="stable"
+            ).reset_index(drop=True)
         )
 
-        st.altair_chart(status_chart.mark_bar())
-
-        st.markdown(f"<div class='section-banner'><h5>Species by Country</h5></div>", unsafe_allow_html=True)
-
-        chloropleth_df = filtered_df.groupby(["Country", "ISO3166 ID"]).agg({
-            "Binomial name": "nunique"
-        }).reset_index()
-        chloropleth_df.columns = ["Country", "ISO3166 ID", "NumSpecies"]
-
-        # Sort the DataFrame based on "Unique_BinomialName_Count" in descending order
-        sorted_chloropleth_df = chloropleth_df.sort_values(by="NumSpecies", ascending=False)
-
-        # Reset the index and create a new column with row numbers
-        sorted_chloropleth_df['RowNumber'] = range(1, len(sorted_chloropleth_df) + 1)
-        sorted_chloropleth_df.reset_index(drop=True, inplace=True)
-
-        n = 10
-        colour_scheme = "goldgreen"
-        # Create two columns for the charts
-        col1, col2 = st.columns([0.3, 0.7])
-
-        # Chart 1 - Bar Chart
-        with col1:
-            country_chart = alt.Chart(sorted_chloropleth_df.head(n)).mark_bar().encode(
-                y=alt.Y('Country',
-                        axis=alt.Axis(title=f'Top {n} countries', titleFont="Fira Sans Condensed", labelFontSize=12,
-                                      labelFont="Fira Sans Condensed", labelOverlap=True), sort="-x"),
-                x=alt.X('NumSpecies',
-                        axis=alt.Axis(title='# Species', titleFont="Fira Sans Condensed", labelFont="Fira Sans Condensed",
-                                      labelOverlap=True, tickMinStep=1)),
-                color=alt.Color('RowNumber', scale=alt.Scale(scheme=colour_scheme), sort="descending", legend=None),
-                tooltip=[
-                    alt.Tooltip('Country:N'),
-                    alt.Tooltip('NumSpecies:Q', title='# Species')
-                ]
-            ).properties(height=300)
-            st.altair_chart(country_chart, use_container_width=True)
-
-        # Chart 2 - Choropleth Map
-        with col2:
-            country_map = alt.Chart(countries).mark_geoshape(
-                stroke='#353535',
-                strokeWidth=0.3
-            ).transform_lookup(
-                lookup='id',
-                from_=alt.LookupData(data=sorted_chloropleth_df, key='ISO3166 ID', fields=['NumSpecies', 'Country'])
-            ).transform_calculate(
-                NumSpecies='isValid(datum.NumSpecies) ? datum.NumSpecies : -1',
-            ).encode(
-                color=alt.condition('datum.NumSpecies > 0',
-                                    alt.Color('NumSpecies:Q', scale=alt.Scale(scheme=colour_scheme), sort="ascending",
-                                              legend=None),
-                                    alt.value('#242424')
-                                    ),
-                tooltip=[
-                    alt.Tooltip('Country:N'),
-                    alt.Tooltip('NumSpecies:Q', title='# Species')
-                ]
-            ).project(
-                "naturalEarth1"
-            ).properties(height=250)
-
-            st.altair_chart(country_map, use_container_width=True)
-
-        table_columns = ["Animal", "Binomial name", "Species status code"]
-        st.markdown(f"<div class='section-banner'><h5>List of Species</h5></div>", unsafe_allow_html=True)
-        table_df = filtered_df[table_columns].drop_duplicates().copy()
-        table_df["IUCN status"] = table_df["Species status code"].map(lambda x: f'<span style="{status_css.get(x, "")}" class="ConservationStatusLabel">{x}</span>' if x is not None else "")
-        table_df["Scientific name"] = table_df["Binomial name"]
-        table_df = table_df[["Animal", "Scientific name", "IUCN status"]]
-        table_df.reset_index(drop=True, inplace=True)
-        table_df.index = table_df.index + 1
+        n_pages = page_count(len(species_df), species_page_size)
+        page = page_col.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1)
+
+        def build_species_table():
+            table_df = table_page(species_df, page, species_page_size).copy()
+            table_df["IUCN status"] = status_badges(table_df["Species status code"], status_css)
+            table_df["Scientific name"] = table_df["Binomial name"]
+            return table_df[["Animal", "Scientific name", "IUCN status"]]
 
         # Convert DataFrame to HTML
-        html_table = table_df.to_html(escape=False, index=False, classes=['styled-table', 'table-sortable'])
-
-        st.markdown(f"<div class='species_table'>{html_table}</div>", unsafe_allow_html=True)
-
-        st.markdown(f"<div class='section-banner'><h5>Species appearances over time</h5></div>", unsafe_allow_html=True)
-
-        dot_plot_df = filtered_df.sort_values("Air date", ascending=False).copy()
-        dot_plot_df["Show"] = dot_plot_df.apply(lambda x: f'{x["Show"]} ({x["Air date"].strftime("%Y")})' if x["Air date"] is not None else "", axis=1)
-
-        # Group the DataFrame by "Binomial name" and select the first row for each group (highest "Times_Appeared" value)
-        last_appearance = dot_plot_df.groupby("Binomial name").first()
-
-        # Group the DataFrame by "Binomial name" and select the first row for each group (lowest "Times_Appeared" value)
-        first_appearance = dot_plot_df.groupby("Binomial name").last()
-
-        # Merge the last appearance information back into the original DataFrame
-        dot_plot_df = pd.merge(dot_plot_df, last_appearance[["Show", "Episode", "Air date", "# Appearances"]],
-                               on="Binomial name",
-                               how="left").copy()
-
-        dot_plot_df.rename(columns={
-                                  "Show_x": "Show",
-                                  "Episode_x": "Episode",
-                                  "Air date_x": "Air date",
-                                  "Show_y": "Last Appeared In",
-                                  "Episode_y": "Last Appeared In Episode",
-                                  "Air date_y": "Last Appeared Date",
-                                  "# Appearances_y": "# Times Featured"}, inplace=True)
-
-        dot_plot_df.sort_values(by=["Last Appeared Date"], ascending=False, inplace=True)
-        max_animals_to_display = 20
-        last_appearance_order = dot_plot_df["Animal"].unique()
-        most_recent_animals = last_appearance_order[:max_animals_to_display]
-        dot_plot_df = dot_plot_df[dot_plot_df["Animal"].isin(most_recent_animals)]
-
-        dot_plot_chart = alt.Chart(
-            data=dot_plot_df
-        ).mark_line(color='#96b3bdff', point=True, strokeDash=[4, 1]).encode(
-            x=alt.X("Air date:T", title=""),
-            y=alt.Y("Animal:N", title="", sort=most_recent_animals, axis=alt.Axis(labelLimit=200)),
-            detail="Animal:N",
-            tooltip=[alt.Tooltip('Animal:N'), alt.Tooltip('Show:N')],
-            color=alt.Color('Last Appeared Date:N', scale=alt.Scale(scheme="goldred"), sort="descending", legend=None)
-        ).configure_point(
-            size=100,
-            color='#63c5ff'
-        )
+        with perf.stage("species list") as timing:
+            html_table = cached_table_html(species_key + (species_sort_selection, page), build_species_table)
+            timing.rows = len(species_df)
+            timing.bytes = len(html_table)
+
+            first_row = (page - 1) * species_page_size + 1
+            last_row = min(page * species_page_size, len(species_df))
+            st.caption(f"Showing {first_row:,}–{last_row:,} of {len(species_df):,} species")
+
+            st.markdown(f"<div class='species_table'>{html_table}</div>", unsafe_allow_html=True)
+
+
+    if animal_tab.open:
+        with animal_tab:
+            render_animal_tab()
 
-        st.altair_chart(dot_plot_chart, use_container_width=True)
+    if location_tab.open:
+        with location_tab:
+            render_location_tab()
+finally:
+    perf.finish_run()
@@ -0,0 +1,23 @@
+import altair as alt
+
+# Country outlines bundled with the app and served by Streamlit's static file server
+# (server.enableStaticServing), so maps never wait on the vega-datasets CDN.
+# Rebuild with scripts/build_world_topology.py.
+world_topology_url = "app/static/world-110m.json"
+
+countries = alt.topo_feature(world_topology_url, "countries")
+
+
+def base_map(topology_url=world_topology_url):
+    # Grey country outlines behind the animal locations
+    return alt.Chart(alt.topo_feature(topology_url, "countries")).mark_geoshape(
+        fill='#353535',
+        stroke='#686868',
+        strokeWidth=0.3
+    ).encode(
+        tooltip=alt.value(None),
+    ).project('naturalEarth1').interactive()
+
+
+# Built once per process for the app
+countries_map = base_map()
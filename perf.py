@@ -0,0 +1,118 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Per-rerun timings are logged as JSON lines to stderr, or appended to the file named here;
+# "off" leaves the perf logger to the deployment's own logging configuration
+perf_log = os.environ.get("WOS_PERF_LOG", "stderr")
+
+# The perf panel is hidden unless enabled here or opened with ?perf=1 in the page URL
+perf_panel_enabled = os.environ.get("WOS_PERF_PANEL") == "1"
+
+
+def _configure_log():
+    # Streamlit configures only its own loggers, so without a handler the INFO lines would be dropped
+    if perf_log == "off" or logger.handlers:
+        return
+    handler = logging.StreamHandler() if perf_log == "stderr" else logging.FileHandler(perf_log)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+_configure_log()
+
+# Each Streamlit session reruns its script on its own thread, so timings are kept per thread
+_run = threading.local()
+
+
+class Stage:
+    __slots__ = ("name", "seconds", "rows", "bytes")
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = rows
+        self.bytes = None
+
+
+def start_run(page):
+    _run.page = page
+    _run.started = time.perf_counter()
+    _run.stages = []
+    _run.active = True
+
+
+@contextmanager
+def stage(name, rows=None):
+    # Time a named stage of the current rerun; set .rows and .bytes on the record inside the block
+    record = Stage(name, rows)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        stages = getattr(_run, "stages", None)
+        if stages is not None:
+            stages.append(record)
+
+
+def run_stages():
+    return list(getattr(_run, "stages", []))
+
+
+def finish_run(panel=True):
+    # One structured log line per rerun, then the perf panel if it is enabled
+    _run.active = False
+    stages = run_stages()
+    total = time.perf_counter() - getattr(_run, "started", time.perf_counter())
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            "event": "rerun",
+            "page": getattr(_run, "page", None),
+            "total_ms": round(total * 1000, 1),
+            "stages": [{"stage": s.name, "ms": round(s.seconds * 1000, 1), "rows": s.rows, "bytes": s.bytes}
+                       for s in stages],
+        }))
+
+    if panel and (perf_panel_enabled or st.query_params.get("perf") == "1"):
+        perf_panel(stages, total)
+
+
+def fragment(page):
+    # st.fragment whose own reruns are timed and logged as a run of `page`. Run as part of the
+    # whole script, its stages are recorded in the page's run instead.
+    def decorate(render):
+        @functools.wraps(render)
+        def run(*args, **kwargs):
+            if getattr(_run, "active", False):
+                return render(*args, **kwargs)
+            start_run(page)
+            try:
+                return render(*args, **kwargs)
+            finally:
+                # Fragments cannot write to the sidebar, so fragment reruns are only logged
+                finish_run(panel=False)
+        return st.fragment(run)
+    return decorate
+
+
+def perf_panel(stages, total):
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(f"Rerun took {total * 1000:,.0f} ms")
+        st.dataframe(pd.DataFrame({
+            "Stage": [s.name for s in stages],
+            "ms": [round(s.seconds * 1000, 1) for s in stages],
+            "Rows": pd.array([s.rows for s in stages], dtype="Int64"),
+            "Bytes": pd.array([s.bytes for s in stages], dtype="Int64"),
+        }), hide_index=True)
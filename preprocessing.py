@@ -0,0 +1,254 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+from country_codes import resolve_countries
+
+initial_cols = ["Appearance_number",
+                "Coappearance_number",
+                "Other_animals",
+                "Show",
+                "Episode",
+                "Air_date",
+                "Is_New",
+                "ID",
+                "Image_1",
+                "Image_2",
+                "Image_3",
+                "Sequence_number",
+                "Animal_name",
+                "Animal_name_original",
+                "Scientific_name",
+                "Species_status",
+                "Species_status_original",
+                "Class",
+                "Family",
+                "Species_lock_date",
+                "Summary",
+                "Location",
+                "Country",
+                "Country_code",
+                "Continent",
+                "Scientific_advisor",
+                "Notes",
+                "Link_1",
+                "Link_2",
+                "Link_3",
+                "Lat",
+                "Lon",
+                "Sentence_start",
+                "Sentence_end",
+                "Animal_group"
+                ]
+
+status_code_labels = {
+    "LC": "Least Concern",
+    "NT": "Near Threatened",
+    "VU": "Vulnerable",
+    "EN": "Endangered",
+    "CR": "Critically Endangered",
+    "EW": "Extinct in the Wild",
+    "DO": "Domesticated",
+    "DD": "Data Deficient",
+    "NE": "Not Evaluated",
+    "EX": "Extinct"
+}
+
+status_order = ["LC", "NT", "VU", "EN", "CR", "EW", "EX", "DO", "DD", "NE"]
+
+# ------------- SCHEMA ------------ #
+
+# Long free-text columns the app never displays, kept out of raw_data and loaded on demand by text_data()
+text_cols = ["Summary",
+             "Notes",
+             "Link_1",
+             "Link_2",
+             "Link_3",
+             "Sentence_start",
+             "Sentence_end"
+             ]
+
+# Low-cardinality columns stored as pandas categories
+category_cols = ["Show",
+                 "Episode",
+                 "Country",
+                 "Country code",
+                 "Continent",
+                 "Class",
+                 "Family",
+                 "Animal",
+                 "Animal subspecies",
+                 "Animal group",
+                 "Binomial name",
+                 "Species status",
+                 "Subspecies status"
+                 ]
+
+status_code_cols = ["Species status code", "Subspecies status code"]
+
+date_cols = ["Air date", "Species lock date"]
+numeric_cols = ["# Appearances", "Lat", "Lon"]
+
+# Data version of each frame by identity. Kept beside the frames rather than in df.attrs, which
+# pandas carries over to slices and copies that no longer hold the same data.
+_versions = {}
+
+# Frames and indexes derived from the most recent data versions
+max_cached_versions = 2
+_cache = {}
+_cached_versions = OrderedDict()
+_cache_lock = threading.Lock()
+# One lock per entry being built, so concurrent sessions wait for a single build
+_builders = {}
+
+
+def data_version(df):
+    # Content hash of a source frame, remembered for the frame so it is only computed once
+    version = _versions.get(id(df))
+    if version is None:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        version = hashlib.sha1(row_hashes.tobytes()).hexdigest()
+        _remember_version(df, version)
+    return version
+
+
+def forget_data_version(df):
+    # The frame was changed in place, so it is hashed again on next use
+    _versions.pop(id(df), None)
+
+
+def _remember_version(df, version):
+    key = id(df)
+    if key not in _versions:
+        weakref.finalize(df, _versions.pop, key, None)
+    _versions[key] = version
+
+
+def _shared(result, version):
+    # Cached frames are shared by every session. Each caller gets a shallow copy, which under
+    # copy-on-write (always on from pandas 3, hence the requirement) copies data only when modified,
+    # so no caller can change the cached frame.
+    if not isinstance(result, pd.DataFrame):
+        return result
+    view = result.copy(deep=False)
+    _remember_version(view, version)
+    return view
+
+
+def memoize(kind, df, build):
+    # Build something derived from df once per data version, keeping only the latest versions.
+    # Sessions asking for the same entry while it is being built wait for that build.
+    version = data_version(df)
+    key = (kind, version)
+    with _cache_lock:
+        if key in _cache:
+            _cached_versions.move_to_end(version)
+            return _shared(_cache[key], version)
+        builder = _builders.setdefault(key, threading.Lock())
+
+    with builder:
+        with _cache_lock:
+            if key in _cache:
+                return _shared(_cache[key], version)
+        try:
+            result = build(df)
+        except BaseException:
+            with _cache_lock:
+                _builders.pop(key, None)
+            raise
+        # Frames derived from df share its version, so caches keyed on them follow the source data
+        if isinstance(result, pd.DataFrame):
+            _remember_version(result, version)
+
+        with _cache_lock:
+            _builders.pop(key, None)
+            _cache[key] = result
+            _cached_versions[version] = None
+            _cached_versions.move_to_end(version)
+            while len(_cached_versions) > max_cached_versions:
+                stale_version, _ = _cached_versions.popitem(last=False)
+                for stale_key in [k for k in _cache if k[1] == stale_version]:
+                    del _cache[stale_key]
+    return _shared(result, version)
+
+
+def clear_cache():
+    # Drop every derived frame and index; they are rebuilt on next use
+    with _cache_lock:
+        _cache.clear()
+        _cached_versions.clear()
+
+
+def preprocess(df):
+    # Build raw_data from the appearances sheet, once per data version. The cached frame is
+    # shared between sessions; callers get a copy-on-write view of it.
+    return memoize("raw_data", df, build_raw_data)
+
+
+def text_data(df):
+    # Long text columns for the rows kept in raw_data, indexed the same way
+    return memoize("text_data", df, build_text_data)
+
+
+def build_raw_data(df):
+    raw_data = df[[col for col in initial_cols if col not in text_cols]].copy()
+
+    # Renaming columns
+    column_mapping = {col: col.replace("_", " ") for col in raw_data.columns}
+    raw_data.rename(columns=column_mapping, inplace=True)
+
+    raw_data.rename(columns={'Species status': 'Subspecies status code',
+                             'Species status original': 'Species status code',
+                             'Animal name original': 'Animal',
+                             'Animal name': 'Animal subspecies',
+                             'Appearance number': '# Appearances'
+                             },
+                    inplace=True)
+
+    # Get binomial name where scientific name contains trinomial name
+    raw_data["Binomial name"] = raw_data["Scientific name"].str.split().str[:2].str.join(" ")
+
+    # Map species status codes to full status names, keeping codes that have no name
+    raw_data["Species status"] = raw_data["Species status code"].map(status_code_labels).fillna(raw_data["Species status code"])
+    raw_data["Subspecies status"] = raw_data["Subspecies status code"].map(status_code_labels).fillna(raw_data["Subspecies status code"])
+
+    # Get ISO3166 ID using country code, or the country name where the code is missing or unknown
+    by_code = resolve_countries(raw_data["Country code"], report=False)
+    raw_data["ISO3166 ID"] = by_code.fillna(resolve_countries(raw_data["Country"].where(by_code.isna())))
+
+    # Remove indeterminate species
+    raw_data = raw_data[~raw_data["Animal"].str.contains("sp.", regex=False, na=False)]
+
+    return apply_schema(raw_data)
+
+
+def apply_schema(raw_data):
+    raw_data = raw_data.copy()
+
+    for col in date_cols:
+        raw_data[col] = pd.to_datetime(raw_data[col], errors="coerce")
+    for col in numeric_cols:
+        raw_data[col] = pd.to_numeric(raw_data[col], errors="coerce")
+    code_dtype = status_code_dtype(raw_data[status_code_cols])
+    for col in status_code_cols:
+        raw_data[col] = raw_data[col].astype(code_dtype)
+    for col in category_cols:
+        raw_data[col] = raw_data[col].astype("category")
+
+    return raw_data
+
+
+def status_code_dtype(codes):
+    # Status codes ordered from least to most threatened, then the non-assessed codes, then any other
+    # codes in the data (e.g. lowercase or mistyped ones) so they are kept rather than made missing
+    seen = pd.unique(codes.stack().dropna().astype(str))
+    return pd.CategoricalDtype(status_order + sorted(set(seen) - set(status_order)), ordered=True)
+
+
+def build_text_data(df):
+    kept_rows = preprocess(df).index
+    text = df.loc[kept_rows, text_cols]
+    return text.rename(columns={col: col.replace("_", " ") for col in text_cols})
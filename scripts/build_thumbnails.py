@@ -0,0 +1,75 @@
+# Downloads every gallery image listed in the image manifest and writes small WebP thumbnails
+# to static/thumbnails, plus an index.json the app uses to serve them with srcset.
+# Only images without thumbnails yet are fetched, so it can be rerun after each data refresh.
+#
+# Reads the local appearances snapshot, so it needs no Google credentials. Needs Pillow:
+#   python scripts/build_thumbnails.py [--workers 16]
+import argparse
+import io
+import json
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gallery import image_manifest, thumbnail_dir, thumbnail_heights, thumbnail_name  # noqa: E402
+from preprocessing import preprocess  # noqa: E402
+from snapshot import SNAPSHOT_DIR  # noqa: E402
+
+
+def build_thumbnails(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        image = Image.open(io.BytesIO(response.read()))
+        image.load()
+
+    entry = {}
+    for height in thumbnail_heights:
+        width = max(1, round(image.width * height / image.height))
+        name = thumbnail_name(url, height)
+        image.resize((width, height), Image.LANCZOS).save(thumbnail_dir / name, "WEBP", quality=80)
+        entry[str(height)] = name
+        if height == thumbnail_heights[0]:
+            entry["width"] = width
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build gallery thumbnails for every image in the manifest.")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    df = pd.read_parquet(SNAPSHOT_DIR / "appearances.parquet")
+    urls = image_manifest(preprocess(df))["url"].unique()
+
+    thumbnail_dir.mkdir(parents=True, exist_ok=True)
+    index_path = thumbnail_dir / "index.json"
+    index = json.loads(index_path.read_text()) if index_path.exists() else {}
+    missing = [url for url in urls if url not in index]
+    print(f"{len(urls):,} images, {len(missing):,} without thumbnails")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(build_thumbnails, url): url for url in missing}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                index[futures[future]] = future.result()
+            except Exception as error:
+                failed += 1
+                print(f"Failed {futures[future]}: {error}")
+            if done % 100 == 0:
+                print(f"{done:,}/{len(missing):,}")
+
+    # Write the index last and atomically so the app only ever sees complete thumbnails
+    tmp_path = index_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(index))
+    tmp_path.replace(index_path)
+    print(f"Done, {failed:,} failed")
+
+
+if __name__ == "__main__":
+    main()
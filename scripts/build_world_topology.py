@@ -0,0 +1,50 @@
+# Builds static/world-110m.json, the country outlines used by every map, from the Natural Earth
+# 1:110m admin-0 shapefile (e.g. geopandas<1.0 datasets/naturalearth_lowres). Feature ids are
+# ISO 3166 numeric codes so they line up with the "ISO3166 ID" column of raw_data.
+#
+# Needs pyshp, shapely and topojson, which are not app requirements:
+#   python scripts/build_world_topology.py path/to/naturalearth_lowres.shp
+import json
+import sys
+from pathlib import Path
+
+import iso3166
+import shapefile
+import topojson
+from shapely.geometry import shape
+
+output_path = Path(__file__).resolve().parent.parent / "static" / "world-110m.json"
+
+
+def build_topology(shapefile_path, simplify=0.05):
+    reader = shapefile.Reader(shapefile_path)
+    features = []
+    for shape_record in reader.iterShapeRecords():
+        record = shape_record.record.as_dict()
+        country = iso3166.countries_by_alpha3.get(record["iso_a3"])
+        features.append({
+            "type": "Feature",
+            "properties": {"name": record["name"], "id": int(country.numeric) if country else None},
+            "geometry": shape(shape_record.shape.__geo_interface__).__geo_interface__,
+        })
+
+    topology = topojson.Topology(
+        {"type": "FeatureCollection", "features": features},
+        object_name="countries",
+        prequantize=1e5,
+        toposimplify=simplify,
+    ).to_dict()
+
+    # Vega looks features up by their top-level id
+    for geometry in topology["objects"]["countries"]["geometries"]:
+        country_id = geometry["properties"].pop("id")
+        geometry.pop("id", None)
+        if country_id is not None:
+            geometry["id"] = country_id
+    return topology
+
+
+if __name__ == "__main__":
+    topology = build_topology(sys.argv[1])
+    output_path.write_text(json.dumps(topology, separators=(",", ":")))
+    print(f"Wrote {output_path} ({output_path.stat().st_size:,} bytes)")
@@ -0,0 +1,215 @@
+# Pre-renders the "Search by animal" page of every animal as static HTML, with the same header,
+# gallery, locations map, timeline chart and timeline table as the app, so the pages can be
+# served from a CDN. Writes site/animals/<animal>.html, site/index.html and the shared assets.
+#
+# Export is incremental: a page is re-rendered only when its animal's rows, watch links or
+# thumbnails, or the page template or the code that renders it, changed since the last export.
+# Pages render in parallel across a process pool. Reads the local snapshots, so it needs no
+# Google credentials:
+#   python scripts/export_animal_pages.py [--out site] [--workers 8] [--full]
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html import escape
+from pathlib import Path
+from urllib.parse import quote
+
+import altair as alt
+import pandas as pd
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+from animal_index import animal_index  # noqa: E402
+from animal_page import header_html, locations_chart, no_images_html, timeline_chart, timeline_table  # noqa: E402
+from episodes import episode_index  # noqa: E402
+from gallery import animal_images, gallery_html, image_manifest, sample_gallery, thumbnail_dir, thumbnail_index  # noqa: E402
+from maps import base_map  # noqa: E402
+from preprocessing import preprocess  # noqa: E402
+from snapshot import SNAPSHOT_DIR  # noqa: E402
+from tables import table_html  # noqa: E402
+
+# Bump whenever the page layout changes so every page is re-rendered
+page_version = 2
+
+# Modules the pages are rendered with; a change to any of them re-renders every page
+rendering_modules = ["animal_page.py", "chart_data.py", "formatting.py", "gallery.py", "maps.py", "tables.py",
+                     "scripts/export_animal_pages.py"]
+
+vega_scripts = "".join(
+    f'<script src="https://cdn.jsdelivr.net/npm/{name}@{version}"></script>'
+    for name, version in [("vega", alt.VEGA_VERSION), ("vega-lite", alt.VEGALITE_VERSION), ("vega-embed", alt.VEGAEMBED_VERSION)]
+)
+
+# Loaded once per worker process
+_state = {}
+
+
+def load_state():
+    if _state:
+        return _state
+    df = pd.read_parquet(SNAPSHOT_DIR / "appearances.parquet")
+    df_episodes = pd.read_parquet(SNAPSHOT_DIR / "episodes.parquet")
+    raw_data = preprocess(df)
+    _state.update(animals=animal_index(raw_data), manifest=image_manifest(raw_data), episodes=episode_index(df_episodes))
+    return _state
+
+
+def page_names(animals):
+    # File name per animal, kept unique where two names reduce to the same slug
+    names, taken = {}, set()
+    for animal in animals:
+        slug = re.sub(r"[^a-z0-9]+", "-", animal.lower()).strip("-") or "animal"
+        if slug in taken:
+            slug += "-" + hashlib.sha1(animal.encode()).hexdigest()[:6]
+        taken.add(slug)
+        names[animal] = slug + ".html"
+    return names
+
+
+def fingerprints(state, template_hash):
+    # Hash of everything a page is rendered from, per animal, from one vectorized row hash
+    animals = state["animals"]
+    rows = animals.sorted_data.join(state["episodes"][["Watch now"]], on=["Show", "Episode"])
+    row_hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    thumbnails = thumbnail_index()
+
+    versions, result = {}, {}
+    for animal, (start, stop) in animals.ranges.items():
+        versions[animal] = hashlib.sha1(row_hashes[start:stop].tobytes()).hexdigest()
+        urls = animal_images(state["manifest"], animal)["url"]
+        images = json.dumps([thumbnails.get(url) for url in urls])
+        result[animal] = hashlib.sha1(f"{template_hash}|{versions[animal]}|{images}".encode()).hexdigest()
+    return versions, result
+
+
+def chart_div(name, chart):
+    # "</" is escaped so text in the data can never close the script element
+    spec = chart.properties(width="container").to_json(indent=None).replace("</", "<\\/")
+    return (f'<div id="{name}" style="width:100%"></div>'
+            f'<script>vegaEmbed("#{name}", {spec}, {{actions: false, theme: "dark"}});</script>')
+
+
+def render_page(animal, version, path):
+    state = load_state()
+    animal_data = state["animals"].rows(animal)
+    header, info = header_html(escape(animal), animal_data)
+
+    animal_data = animal_data.drop_duplicates().reset_index(drop=True)
+    animal_data.index += 1
+
+    images = sample_gallery(animal_images(state["manifest"], animal), animal, version)
+    gallery = gallery_html(images, thumbnail_base="../thumbnails") if len(images) else no_images_html
+    map_chart = locations_chart(animal_data, base_map("../world-110m.json"))
+    table = table_html(timeline_table(animal_data, state["episodes"]))
+
+    page = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1" />
+  <title>{escape(animal)} - Wildlife On Screen</title>
+  <link rel="stylesheet" href="../style.css" />
+  {vega_scripts}
+</head>
+<body>
+  {header}
+  {info}
+  <div class='section-banner'><h5>Image Gallery</h5></div>
+  {gallery}
+  <div class='section-banner'><h5>Locations</h5></div>
+  {chart_div("locations", map_chart)}
+  <div class='section-banner'><h5>Timeline of Appearances</h5></div>
+  {chart_div("timeline", timeline_chart(animal_data))}
+  <div class='species_table'>{table}</div>
+</body>
+</html>
+"""
+    # Write to a temporary file first so a page being served is never half written
+    tmp_path = Path(f"{path}.tmp")
+    tmp_path.write_text(page)
+    os.replace(tmp_path, path)
+    return animal
+
+
+def write_index(out_dir, names):
+    links = "".join(f'<li><a href="animals/{quote(name)}">{escape(animal)}</a></li>' for animal, name in names.items())
+    (out_dir / "index.html").write_text(
+        '<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8" /><title>Wildlife On Screen</title>'
+        f'<link rel="stylesheet" href="style.css" /></head><body><h1>Animals</h1><ul>{links}</ul></body></html>'
+    )
+
+
+def copy_assets(out_dir):
+    shutil.copy2(root / "style.css", out_dir / "style.css")
+    shutil.copy2(root / "static" / "world-110m.json", out_dir / "world-110m.json")
+
+    # Thumbnails never change once built, so only new ones are copied
+    (out_dir / "thumbnails").mkdir(exist_ok=True)
+    if thumbnail_dir.exists():
+        for thumbnail in thumbnail_dir.glob("*.webp"):
+            target = out_dir / "thumbnails" / thumbnail.name
+            if not target.exists():
+                shutil.copy2(thumbnail, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a static HTML page for every animal.")
+    parser.add_argument("--out", type=Path, default=Path("site"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--full", action="store_true", help="re-render every page")
+    args = parser.parse_args()
+
+    pages_dir = args.out / "animals"
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    copy_assets(args.out)
+
+    state = load_state()
+    template_hash = hashlib.sha1(f"{page_version}|{(root / 'style.css').read_text()}|{alt.VEGALITE_VERSION}".encode())
+    for module in rendering_modules:
+        template_hash.update((root / module).read_bytes())
+    template_hash = template_hash.hexdigest()
+    versions, current = fingerprints(state, template_hash)
+    names = page_names(state["animals"].animals)
+
+    manifest_path = args.out / "manifest.json"
+    previous = {} if args.full or not manifest_path.exists() else json.loads(manifest_path.read_text())
+    stale = [animal for animal in names
+             if previous.get(animal, {}).get("fingerprint") != current[animal] or not (pages_dir / names[animal]).exists()]
+    print(f"{len(names):,} animals, {len(stale):,} pages to render")
+
+    manifest = {animal: entry for animal, entry in previous.items() if animal in names and animal not in stale}
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=load_state) as executor:
+        futures = {executor.submit(render_page, animal, versions[animal], pages_dir / names[animal]): animal for animal in stale}
+        for done, future in enumerate(as_completed(futures), start=1):
+            animal = futures[future]
+            try:
+                future.result()
+                manifest[animal] = {"page": names[animal], "fingerprint": current[animal]}
+            except Exception as error:
+                failed += 1
+                print(f"Failed {animal}: {error}")
+            if done % 100 == 0:
+                print(f"{done:,}/{len(stale):,}")
+
+    # Pages of animals no longer in the data are removed
+    pages = set(names.values())
+    for animal, entry in previous.items():
+        if animal not in names and entry["page"] not in pages and (pages_dir / entry["page"]).exists():
+            (pages_dir / entry["page"]).unlink()
+
+    write_index(args.out, names)
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(manifest))
+    tmp_path.replace(manifest_path)
+    print(f"Done, {failed:,} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+default_precision = 12
+
+# Each sketch holds 2^precision one-byte registers
+min_precision, max_precision = 4, 18
+
+
+def check_precision(precision):
+    if not min_precision <= precision <= max_precision:
+        raise ValueError(f"HyperLogLog precision must be between {min_precision} and {max_precision}, got {precision}")
+    return precision
+
+
+def hash_values(values):
+    # Stable 64-bit hashes of arbitrary values, e.g. species names
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _bit_length(values):
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        large = values >= (np.uint64(1) << np.uint64(shift))
+        length[large] += shift
+        values[large] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def register_updates(hashes, precision=default_precision):
+    # Register index and rank of each hash: the top `precision` bits pick the register and
+    # the rank is the position of the first set bit in the remaining bits
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    rest_bits = 64 - precision
+    index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    rank = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+    return index, rank
+
+
+def estimate(registers):
+    # HyperLogLog cardinality estimate for each row of a (sketches x registers) array
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+
+    # Linear counting is more accurate while many registers are still empty
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
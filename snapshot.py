@@ -0,0 +1,191 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import data_version, forget_data_version
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ.get("WOS_SNAPSHOT_DIR", ".snapshots"))
+
+# Object columns Arrow cannot store as a single type, e.g. an Episode column holding both 3 and "Ep 1"
+mixed_types = {"mixed", "mixed-integer"}
+
+
+def parquet_safe(df):
+    # Store columns that mix value types as text, so the frame can be written as Parquet
+    mixed = [col for col in df.columns
+             if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) in mixed_types]
+    if not mixed:
+        return df
+    return df.assign(**{col: df[col].astype("string") for col in mixed})
+
+
+def _same_values(a, b):
+    # Row by row equality of two frames with the same columns, treating missing values as equal
+    for col in a.columns:
+        x, y = a[col].astype(object).to_numpy(), b[col].astype(object).to_numpy()
+        if not ((x == y) | (pd.isna(x) & pd.isna(y))).all():
+            return False
+    return True
+
+
+class SnapshotStore:
+    """Serves a sheet from a local Parquet snapshot and refreshes it in the background.
+
+    `fetch(since)` must return the full sheet when `since` is None, otherwise only the
+    rows whose `watermark_col` is on or after `since`. Incremental fetches are merged
+    into the snapshot on `key_cols`; every `full_every`-th refresh refetches the whole
+    sheet so deleted rows and edits that did not move the watermark are picked up. A
+    failed refresh keeps the current snapshot and is retried after `retry_after` seconds.
+    """
+
+    def __init__(self, name, fetch, key_cols=None, watermark_col=None, ttl=6000, full_every=6, retry_after=300):
+        self.name = name
+        self.fetch = fetch
+        self.key_cols = list(key_cols) if key_cols else None
+        self.watermark_col = watermark_col
+        self.ttl = ttl
+        self.full_every = full_every
+        self.retry_after = retry_after
+        self.path = SNAPSHOT_DIR / f"{name}.parquet"
+
+        self._df = None
+        self._loaded_at = 0.0
+        self._refreshes = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._refreshing = False
+        self._full_pending = False
+
+    def get(self):
+        # Serve whatever snapshot we have and refresh behind it once it goes stale
+        if self._df is None:
+            with self._lock:
+                if self._df is None:
+                    self._load()
+        now = time.time()
+        if now - self._loaded_at > self.ttl and now >= self._retry_at:
+            self.refresh_in_background()
+        return self._df
+
+    def refresh_in_background(self, full=False):
+        # Only one refresh runs at a time; sessions keep being served the current snapshot meanwhile.
+        # A full refresh asked for while an incremental one runs is run by the same thread after it.
+        with self._lock:
+            self._full_pending = self._full_pending or full
+            if not self._refreshing:
+                self._refreshing = True
+                self._refresh_thread = threading.Thread(target=self._refresh_while_pending, name=f"snapshot-{self.name}", daemon=True)
+                self._refresh_thread.start()
+            return self._refresh_thread
+
+    def _refresh_while_pending(self):
+        while True:
+            with self._lock:
+                full, self._full_pending = self._full_pending, False
+            self.refresh(full)
+            with self._lock:
+                if not self._full_pending:
+                    self._refreshing = False
+                    return
+
+    def invalidate(self):
+        # Refetch the whole sheet now rather than at the next TTL expiry, and wait for it
+        self.refresh_in_background(full=True).join()
+        return self._df
+
+    def refresh(self, full=False):
+        try:
+            return self._refresh(full)
+        except Exception:
+            # Keep serving the current snapshot rather than refetching on every rerun
+            logger.exception("Refreshing snapshot %s failed, retrying in %s seconds", self.name, self.retry_after)
+            self._retry_at = time.time() + self.retry_after
+            return self._df
+
+    def _fetch(self, since):
+        return parquet_safe(self.fetch(since))
+
+    def _refresh(self, full):
+        current = self._df
+        since = self._watermark(current)
+        incremental = not full and since is not None and self._refreshes % self.full_every != 0
+
+        df = None
+        if incremental:
+            try:
+                df = self._merge(current, self._fetch(since))
+            except Exception:
+                df = None  # Backend could not filter on the watermark, fall back to a full fetch
+        if df is None:
+            df = self._fetch(None)
+
+        # Nothing changed since the last refresh, so the snapshot and its data version stay as they are
+        if df is not current:
+            self._write(df)
+        self._swap(df)
+        self._refreshes += 1
+        return df
+
+    def _load(self):
+        if self.path.exists():
+            df = pd.read_parquet(self.path)
+            data_version(df)
+            self._df = df
+            self._loaded_at = self.path.stat().st_mtime
+        else:
+            df = self._fetch(None)
+            self._write(df)
+            self._swap(df)
+            self._refreshes = 1
+
+    def _swap(self, df):
+        # Hash the new data here, once, rather than in every session that is served it
+        data_version(df)
+        self._df = df
+        self._loaded_at = time.time()
+
+    def _watermark(self, df):
+        if df is None or self.watermark_col is None or self.watermark_col not in df.columns:
+            return None
+        since = pd.to_datetime(df[self.watermark_col], errors="coerce").max()
+        return None if pd.isna(since) else since
+
+    def _merge(self, current, changed):
+        if not self.key_cols or current[self.key_cols].duplicated().any():
+            return None  # Rows cannot be matched up reliably, only a full fetch is safe
+        changed = changed[current.columns].drop_duplicates(subset=self.key_cols, keep="last").reset_index(drop=True)
+        if changed.empty:
+            return current
+
+        # Changed rows replace the rows with the same key where they are, and new keys are appended,
+        # so a refresh that changes nothing leaves the frame, and so its data version, as it was
+        positions = pd.MultiIndex.from_frame(current[self.key_cols]).get_indexer(
+            pd.MultiIndex.from_frame(changed[self.key_cols])
+        )
+        matched = positions >= 0
+        updates, added = changed[matched], changed[~matched]
+        if added.empty and _same_values(current.iloc[positions[matched]], updates):
+            return current
+
+        rows = np.arange(len(current))
+        rows[positions[matched]] = len(current) + np.arange(len(updates))
+        rows = np.concatenate([rows, len(current) + len(updates) + np.arange(len(added))])
+        return pd.concat([current, updates, added], ignore_index=True).iloc[rows].reset_index(drop=True)
+
+    def _write(self, df):
+        # Content changed, so any data version remembered for the frame is stale
+        forget_data_version(df)
+
+        # Write to a temporary file first so readers never see a half-written snapshot
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from ingest import ingest_csv, ingest_cursor, ingest_parquet
+
+# Backend used for every sheet: "sheets", "parquet", "csv" or "sqlite"
+DATA_SOURCE = os.environ.get("WOS_DATA_SOURCE", "sheets")
+# Local backends read <name>.parquet / <name>.csv, or <name> tables of wildlife.sqlite, from here
+DATA_DIR = Path(os.environ.get("WOS_DATA_DIR", "data"))
+
+# Streamlit secret holding each sheet's URL for the Sheets backend
+sheet_secrets = {
+    "appearances": "private_gsheets_url",
+    "episodes": "private_gsheets_url_episodes",
+}
+
+
+def _since_filter(df, since, watermark_col):
+    # Same rows a sheet query with "WHERE watermark_col >= date 'since'" would return
+    if since is None:
+        return df
+    dates = pd.to_datetime(df[watermark_col], errors="coerce")
+    return df[dates >= pd.Timestamp(since.strftime("%Y-%m-%d"))].reset_index(drop=True)
+
+
+class SheetsSource:
+    """A private Google Sheet read through gsheetsdb with the app's service account."""
+
+    def __init__(self, sheet_url):
+        self.sheet_url = sheet_url
+
+    def fetch(self, since=None, watermark_col=None):
+        from google.oauth2 import service_account
+        from gsheetsdb import connect
+
+        credentials = service_account.Credentials.from_service_account_info(
+            st.secrets["gcp_service_account"],
+            scopes=["https://www.googleapis.com/auth/spreadsheets"],
+        )
+        conn = connect(credentials=credentials)
+
+        query = f'SELECT * FROM "{self.sheet_url}"'
+        if since is not None:
+            query += f" WHERE {watermark_col} >= date '{since.strftime('%Y-%m-%d')}'"
+
+        # Fetch data from the Google Sheet and stream it into a DataFrame in batches.
+        cursor = conn.execute(query)
+        return ingest_cursor(cursor, source=self.describe())
+
+    def describe(self):
+        # Sheet id only, so logs never contain the full private URL
+        return self.sheet_url.rstrip("/").split("/d/")[-1].split("/")[0][:8] + "..."
+
+
+class ParquetSource:
+    """A sheet exported to a Parquet file, e.g. another replica's shared snapshot."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def fetch(self, since=None, watermark_col=None):
+        return _since_filter(ingest_parquet(self.path), since, watermark_col)
+
+    def describe(self):
+        return str(self.path)
+
+
+class CsvSource:
+    """A sheet downloaded as CSV with the sheet's header row."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def fetch(self, since=None, watermark_col=None):
+        return _since_filter(ingest_csv(self.path), since, watermark_col)
+
+    def describe(self):
+        return str(self.path)
+
+
+class SqliteSource:
+    """A table in a SQLite database; dates must be stored as ISO text so they sort."""
+
+    def __init__(self, path, table):
+        self.path = Path(path)
+        self.table = table
+
+    def fetch(self, since=None, watermark_col=None):
+        query = f'SELECT * FROM "{self.table}"'
+        params = ()
+        if since is not None:
+            query += f' WHERE "{watermark_col}" >= ?'
+            params = (since.strftime("%Y-%m-%d"),)
+
+        # Read-only so a shared database is never locked for writing by the app
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            return ingest_cursor(conn.execute(query, params), source=self.describe())
+        finally:
+            conn.close()
+
+    def describe(self):
+        return f"{self.path}:{self.table}"
+
+
+def data_source(name, backend=None):
+    # Source for one sheet ("appearances" or "episodes") on the configured backend
+    backend = backend or DATA_SOURCE
+    if backend == "sheets":
+        return SheetsSource(st.secrets[sheet_secrets[name]])
+    if backend == "parquet":
+        return ParquetSource(DATA_DIR / f"{name}.parquet")
+    if backend == "csv":
+        return CsvSource(DATA_DIR / f"{name}.csv")
+    if backend == "sqlite":
+        return SqliteSource(DATA_DIR / "wildlife.sqlite", name)
+    raise ValueError(f"Unknown data source {backend!r}, expected sheets, parquet, csv or sqlite")
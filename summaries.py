@@ -0,0 +1,24 @@
+from preprocessing import memoize
+
+
+def build_species_summary(raw_data):
+    # First and last appearance of every species, from a single aggregation over air date order
+    appearances = raw_data.loc[
+        raw_data["Binomial name"].notna() & raw_data["Air date"].notna(),
+        ["Binomial name", "Show", "Episode", "Air date", "# Appearances"]
+    ].sort_values(by="Air date", kind="stable")
+
+    return appearances.groupby("Binomial name", observed=True).agg(**{
+        "First Appeared In": ("Show", "first"),
+        "First Appeared In Episode": ("Episode", "first"),
+        "First Appeared Date": ("Air date", "first"),
+        "Last Appeared In": ("Show", "last"),
+        "Last Appeared In Episode": ("Episode", "last"),
+        "Last Appeared Date": ("Air date", "last"),
+        "# Times Featured": ("# Appearances", "last"),
+    })
+
+
+def species_summary(raw_data):
+    # One row per binomial name, built once per data version
+    return memoize("species_summary", raw_data, build_species_summary)
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+table_classes = ['styled-table', 'table-sortable']
+
+
+class RenderCache:
+    """Process-wide LRU cache of rendered output, bounded by entry count and total size."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = render()
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self._bytes += self.sizeof(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self.sizeof(evicted)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+html_cache = RenderCache()
+
+# Sorted tables that are paged through, so turning a page only slices and renders
+frame_cache = RenderCache(max_entries=64, sizeof=lambda frame: int(frame.memory_usage(index=True).sum()))
+
+
+def table_html(table):
+    return table.to_html(escape=False, index=False, classes=table_classes)
+
+
+def cached_table_html(key, build_table):
+    # build_table() returns the frame to render and is only called on a cache miss.
+    # The key must identify everything the table depends on, starting with the data version.
+    return html_cache.get_or_render(key, lambda: table_html(build_table()))
+
+
+def cached_frame(key, build_table):
+    return frame_cache.get_or_render(key, build_table)
+
+
+def page_count(n_rows, page_size):
+    return max(1, -(-n_rows // page_size))
+
+
+def table_page(table, page, page_size):
+    # Rows of a 1-based page
+    start = (page - 1) * page_size
+    return table.iloc[start:start + page_size]
@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+
+from animal_index import AnimalIndex
+
+
+def test_rows_without_an_animal_are_not_in_any_range():
+    raw_data = pd.DataFrame({
+        "Animal": ["b", np.nan, "a", "c", np.nan, "c"],
+        "Air date": pd.to_datetime(["2020-01-01"] * 6),
+    })
+    index = AnimalIndex(raw_data)
+
+    assert index.animals == ["a", "b", "c"]
+    assert index.ranges["c"][1] - index.ranges["c"][0] == 2
+    assert index.rows("c")["Animal"].tolist() == ["c", "c"]
+    assert index.sorted_data["Animal"].notna().all()
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from preprocessing import clear_cache, data_version, memoize
+
+
+def test_derived_frames_do_not_share_the_data_version():
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    version = data_version(df)
+
+    assert data_version(df[df["a"] > 1]) != version
+    assert data_version(df.assign(b=1)) != version
+    assert data_version(df.copy()) == version
+
+
+def test_memoized_frames_cannot_be_changed_by_callers():
+    clear_cache()
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    built = memoize("doubled", df, lambda source: source.assign(a=source["a"] * 2))
+    built["a"] = 0
+    built.loc[0, "a"] = -1
+    built["b"] = 1
+
+    again = memoize("doubled", df, lambda source: None)
+    assert again["a"].tolist() == [2, 4, 6]
+    assert list(again.columns) == ["a"]
+    assert data_version(again) == data_version(df)
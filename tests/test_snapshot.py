@@ -0,0 +1,94 @@
+import time
+
+import pandas as pd
+import pytest
+
+import snapshot
+from ingest import ColumnBuffers
+from snapshot import SnapshotStore
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", tmp_path)
+
+
+def test_mixed_type_columns_are_written():
+    buffers = ColumnBuffers(["ID", "Episode"])
+    buffers.append_rows([(1, 3), (2, "Ep 1")])
+    frame = buffers.to_frame()
+
+    store = SnapshotStore("appearances", lambda since: frame)
+    df = store.get()
+
+    assert df["Episode"].tolist() == ["3", "Ep 1"]
+    assert pd.read_parquet(store.path)["Episode"].tolist() == ["3", "Ep 1"]
+
+
+def test_failed_refresh_keeps_snapshot_and_backs_off():
+    calls = []
+
+    def fetch(since):
+        calls.append(since)
+        if len(calls) > 1:
+            raise ConnectionError("sheet unavailable")
+        return pd.DataFrame({"ID": [1, 2]})
+
+    store = SnapshotStore("appearances", fetch, ttl=0, retry_after=60)
+    df = store.get()
+    store.refresh_in_background().join()
+
+    assert store.get() is df
+    store.get()
+    assert len(calls) == 2
+    assert store._retry_at > time.time()
+
+
+def test_incremental_refresh_keeps_row_order_and_version():
+    from preprocessing import data_version
+
+    current = pd.DataFrame({
+        "ID": [1, 2, 3, 4],
+        "Air_date": pd.to_datetime(["2020-01-01", "2021-01-01", "2020-06-01", "2019-01-01"]),
+        "Show": ["A", "B", "C", "D"],
+    })
+    store = SnapshotStore("appearances", lambda since: None, key_cols=["ID"], watermark_col="Air_date")
+
+    # The watermark refetches the rows on the latest date even when nothing changed
+    unchanged = current[current["Air_date"] >= "2021-01-01"]
+    assert store._merge(current, unchanged) is current
+
+    edited = unchanged.assign(Show="B2")
+    added = pd.DataFrame({"ID": [5], "Air_date": pd.to_datetime(["2021-01-01"]), "Show": ["E"]})
+    merged = store._merge(current, pd.concat([edited, added]))
+    assert merged["ID"].tolist() == [1, 2, 3, 4, 5]
+    assert merged["Show"].tolist() == ["A", "B2", "C", "D", "E"]
+    assert data_version(merged) != data_version(current)
+
+
+def test_full_refresh_asked_for_during_an_incremental_one_is_run():
+    import threading
+
+    release = threading.Event()
+    calls = []
+
+    def fetch(since):
+        calls.append(since)
+        if since is not None:
+            release.wait(5)
+            return pd.DataFrame({"ID": [1], "Air_date": pd.to_datetime(["2020-01-01"])})
+        return pd.DataFrame({"ID": [1, 2], "Air_date": pd.to_datetime(["2020-01-01", "2019-01-01"])})
+
+    store = SnapshotStore("appearances", fetch, key_cols=["ID"], watermark_col="Air_date", full_every=100)
+    store.get()
+    incremental = store.refresh_in_background()
+    while len(calls) < 2:
+        time.sleep(0.01)
+
+    # A full refresh asked for now, as invalidate() does, must not be lost to the running one
+    full = store.refresh_in_background(full=True)
+    release.set()
+    full.join(5)
+    incremental.join(5)
+
+    assert calls[1] is not None and calls[2:] == [None]